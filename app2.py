@@ -1,23 +1,28 @@
 import streamlit as st
+import io
 import os
-import json
+import sqlite3
 import tempfile
-import numpy as np
-from datetime import datetime
+import time
+from concurrent.futures import Future
 from PIL import Image
 
 # --- Imports Modules ---
-from modules.translator_module import translate_text, NLLB_LANGS, detect_language
-from modules.tts_module import text_to_speech
-from modules.file_module import file_translate
-from modules.download_module import save_translation
+from modules.translator_module import translate_text, translate_incremental, memory_suggestions, NLLB_LANGS, detect_language, enable_scheduler, memory
+from modules.tts_module import synthesize_async
+from modules.file_module import stream_translate, translate_docx
+from modules.download_module import render_translation, export_key, MIME_TYPES
+from modules.ocr_module import iter_ocr_images
+from modules.speech_module import transcribe_stream
 
 from modules.chatbot_module import chat_interface
+from modules.model_module import model_status, memory_usage, warm_up_models
+from modules.history_module import add_entry, get_entries, count_entries
+from modules.metrics_module import snapshot, snapshot_json, prometheus_text
 
 
-# Imports IA
-import easyocr
-import whisper
+# Les traductions des sessions simultanées sont regroupées en micro-lots
+enable_scheduler()
 
 # ==========================================
 # 1. CONFIGURATION DE LA PAGE
@@ -138,19 +143,60 @@ st.markdown("""
 # ==========================================
 # 3. FONCTIONS UTILITAIRES
 # ==========================================
-def image_to_text_easyocr(image, target_lang):
-    image_array = np.array(image)
-    reader_europe = easyocr.Reader(['fr', 'en', 'es', 'de'], gpu=False)
-    reader_arabic = easyocr.Reader(['ar', 'fa', 'ur', 'ug', 'en'], gpu=False)
-    reader = reader_arabic if target_lang in ['ar', 'fa', 'ur', 'ug'] else reader_europe
-    results = reader.readtext(image_array, detail=0)
-    return " ".join(results)
+def session_audio(key):
+    """Audio de la session : attend la synthèse lancée en arrière-plan (None si elle a échoué)."""
+    audio = st.session_state.get(key)
+    if isinstance(audio, Future):
+        try:
+            audio = audio.result()
+        except Exception:
+            audio = None
+        st.session_state[key] = audio
+    return audio
+
+# Traduction en direct : on attend LIVE_DEBOUNCE s sans modification avant de retraduire
+LIVE_DEBOUNCE = 0.8
+LIVE_POLL = 0.5
+
+def mark_text_edited():
+    st.session_state['text_edited'] = time.monotonic()
+
+@st.fragment(run_every=LIVE_POLL)
+def live_translation(target_langs):
+    """
+    Panneau de traduction en direct (onglet Texte), réexécuté seul toutes les LIVE_POLL s.
+    Seules les phrases nouvelles ou modifiées depuis la dernière traduction sont retraduites
+    (empreintes de segments gardées dans la session, une table par paire de langues).
+    """
+    text = st.session_state.get('text_val', '')
+    live = st.session_state.setdefault('live', {"text": None, "targets": None, "memos": {}, "translations": {}, "info": ""})
+    pending = text != live["text"] or target_langs != live["targets"]
+    if pending and time.monotonic() - st.session_state.get('text_edited', 0.0) >= LIVE_DEBOUNCE:
+        start = time.perf_counter()
+        translations, memos, changed = {}, {}, 0
+        if text.strip() and target_langs:
+            d_lang = detect_language(text)[0]
+            src = NLLB_LANGS.get(d_lang, NLLB_LANGS['en'])
+            for lang in target_langs:
+                memo = memos[src, lang] = live["memos"].get((src, lang), {})
+                translations[lang], n = translate_incremental(text, src, NLLB_LANGS[lang], memo)
+                changed += n
+            live["info"] = f"{d_lang} ➝ {', '.join(target_langs)} · {changed} phrase(s) retraduite(s) en {time.perf_counter() - start:.2f} s"
+        live.update(text=text, targets=list(target_langs), memos=memos, translations=translations)
+        pending = False
+
+    if pending:
+        st.caption("⏳ Traduction en cours de mise à jour...")
+    elif live["translations"]:
+        st.caption(live["info"])
+    for lang, t_text in live["translations"].items():
+        st.text_area(f"Direct ({lang})", value=t_text, height=150, disabled=True)
 
 # Initialisation Session State pour garder le texte traduit
 if 'input_text' not in st.session_state:
     st.session_state['input_text'] = ""
-if 'translated_text' not in st.session_state:
-    st.session_state['translated_text'] = ""
+if 'translations' not in st.session_state:
+    st.session_state['translations'] = {}  # {langue cible: texte traduit}
 
 # ==========================================
 # 4. INTERFACE UTILISATEUR
@@ -162,6 +208,41 @@ with st.sidebar:
     st.markdown("---")
     menu = st.radio("Navigation", ["Traducteur", "Historique", "Assistant IA", "Infos"], label_visibility="collapsed")
     st.markdown("---")
+    with st.expander("⚙️ Modèles"):
+        for name, info in model_status().items():
+            load_time = f" – {info['load_time']} s" if info['load_time'] is not None else ""
+            if info['source'] == "instantané":
+                load_time += " (instantané)"
+            size = f", {info['size_mb']} Mo" if info['size_mb'] is not None else ""
+            st.caption(f"**{info['description'] or name}** : {info['state']}{load_time}{size}")
+        usage = memory_usage()
+        budget = f" / {usage['budget_mb']:g} Mo" if usage['budget_mb'] else " Mo (sans budget)"
+        st.caption(f"**Mémoire des modèles** : {usage['used_mb']}{budget} – "
+                   f"{usage['loads']} chargements, {usage['evictions']} évictions")
+    with st.expander("⏱️ Latences"):
+        stages = snapshot()
+        if stages:
+            st.dataframe(
+                [{"étape": name, "appels": s["count"], "dernier (ms)": s["last_ms"], "p50 (ms)": s["p50_ms"],
+                  "p95 (ms)": s["p95_ms"], "CPU (s)": s["cpu_seconds"], "tokens": s["tokens"]}
+                 for name, s in sorted(stages.items(), key=lambda item: -item[1]["wall_seconds"])],
+                hide_index=True, use_container_width=True
+            )
+            st.download_button("JSON", snapshot_json(), file_name="metrics.json", mime="application/json")
+            st.download_button("Prometheus", prometheus_text(), file_name="metrics.prom", mime="text/plain")
+        else:
+            st.caption("Aucune mesure pour l'instant.")
+    with st.expander("📚 Mémoire de traduction"):
+        tm_stats = memory.stats()
+        st.caption(f"**Segments mémorisés** : {tm_stats['entries']}")
+        st.caption(f"**Correspondances** : {tm_stats['exact_matches']} exactes, {tm_stats['substituted_matches']} "
+                   f"avec nombres / noms remplacés, {tm_stats['variant_matches']} de ponctuation différente "
+                   f"sur {tm_stats['lookups']} segments ({tm_stats['match_rate']:.0%})")
+        st.caption(f"**Suggestions proposées** : {tm_stats['suggestions']}")
+        st.caption(f"**Recherche moyenne** : {tm_stats['avg_lookup_ms']} ms")
+        if st.button("Importer l'historique", key="tm_import"):
+            with st.spinner("Import de l'historique..."):
+                st.caption(f"{memory.import_history()} segments importés.")
     st.caption("© 2026 AI Solutions")
 
 # --- Page : TRADUCTEUR ---
@@ -181,8 +262,10 @@ if menu == "Traducteur":
     with c2:
         st.markdown("<h3 style='text-align: center; color: #cbd5e0;'>➝</h3>", unsafe_allow_html=True)
     with c3:
-        st.caption("Langue cible")
-        target_lang = st.selectbox("", ["fr", "en", "es", "de", "ar"], index=1, label_visibility="collapsed")
+        st.caption("Langues cibles")
+        target_langs = st.multiselect("", ["fr", "en", "es", "de", "ar"], default=["en"], label_visibility="collapsed")
+        # La première cible sert aussi au document (page par page) et au choix du modèle OCR
+        target_lang = target_langs[0] if target_langs else "en"
     with c4:
         st.caption("Action")
         translate_btn = st.button("Traduire 🚀")
@@ -193,79 +276,142 @@ if menu == "Traducteur":
 
     # Contenu des onglets
     new_input = ""
+    audio_lang = None  # langue détectée par Whisper (évite une seconde détection)
+    doc_input, doc_translation, doc_lang = None, None, None  # document déjà traduit page par page
     
     with tab_txt:
         # On utilise session_state pour que le texte reste affiché
-        text_val = st.text_area("Saisissez votre texte", height=200, placeholder="Tapez ou collez votre texte ici...", label_visibility="collapsed")
+        text_val = st.text_area("Saisissez votre texte", height=200, placeholder="Tapez ou collez votre texte ici...", label_visibility="collapsed",
+                                key='text_val', on_change=mark_text_edited)
         if text_val: new_input = text_val
+        if st.toggle("Traduction en direct ⚡", help="Retraduit automatiquement les phrases modifiées (Ctrl+Entrée ou clic hors de la zone pour valider)"):
+            live_translation(target_langs)
 
     with tab_doc:
         uploaded_file = st.file_uploader("Upload PDF/Word/TXT", type=["txt", "pdf", "docx"], label_visibility="collapsed")
         if uploaded_file:
             st.info(f"Fichier chargé : {uploaded_file.name}")
-            if translate_btn: # Si on clique sur traduire
+            keep_layout = uploaded_file.name.lower().endswith(".docx") and st.checkbox("Conserver la mise en page (DOCX traduit)")
+            if translate_btn and target_langs: # Si on clique sur traduire
                 with st.spinner("Lecture du fichier..."):
-                    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                        tmp.write(uploaded_file.read())
-                        tmp.write(uploaded_file.read()) # Bug fix, read twice safe
+                    suffix = "." + uploaded_file.name.split(".")[-1]
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+                        tmp.write(uploaded_file.getvalue())
                         path = tmp.name
-                    res = file_translate(path, uploaded_file.name.split(".")[-1], "en")
-                    new_input = res["original_text"]
+                    # Traduction page par page : la sortie partielle s'affiche au fur et à mesure
+                    progress = st.progress(0.0, text="Traduction du document...")
+                    preview = st.empty()
+                    originals, translations, pages = [], [], []
+                    try:
+                        for part in stream_translate(path, suffix[1:], target_lang):
+                            originals.append(part["original"])
+                            translations.append(part["translated"])
+                            doc_lang = part["source_lang"]
+                            if part["total"]:
+                                pages.append(part)
+                                mode = " (OCR)" if part["mode"] == "ocr" else ""
+                                progress.progress((part["index"] + 1) / part["total"], text=f"Page {part['index'] + 1} / {part['total']}{mode}")
+                            if part["translated"]:
+                                preview.text(part["translated"])
+                        if keep_layout:
+                            # Mêmes phrases que ci-dessus : essentiellement servies par le cache
+                            buffer = io.BytesIO()
+                            translate_docx(path, buffer, target_lang, source_lang=doc_lang)
+                            st.session_state['translated_docx'] = (uploaded_file.name, buffer.getvalue())
+                    finally:
+                        os.remove(path)
+                    progress.empty()
+                    preview.empty()
+                    ocr_pages = [p for p in pages if p["mode"] == "ocr"]
+                    if ocr_pages:
+                        st.caption(f"{len(ocr_pages)} page(s) scannée(s) reconnue(s) par OCR "
+                                   f"({sum(p['seconds'] for p in ocr_pages):.1f} s) sur {len(pages)}.")
+                        with st.expander("Détail par page"):
+                            st.dataframe([{"page": p["index"] + 1, "mode": p["mode"], "secondes": round(p["seconds"], 2)} for p in pages],
+                                         hide_index=True, use_container_width=True)
+                    new_input = doc_input = "\n".join(originals)
+                    doc_translation = "\n".join(translations)
+
+            translated_docx = st.session_state.get('translated_docx')
+            if keep_layout and translated_docx and translated_docx[0] == uploaded_file.name:
+                st.download_button(
+                    label="⬇️ DOCX traduit (mise en page conservée)",
+                    data=translated_docx[1],
+                    file_name=f"traduction_{uploaded_file.name}",
+                    mime=MIME_TYPES["docx"]
+                )
 
     with tab_img:
-        up_img = st.file_uploader("Upload Image", type=["png", "jpg"], label_visibility="collapsed")
-        if up_img:
-            img = Image.open(up_img)
-            st.image(img, width=300)
+        up_imgs = st.file_uploader("Upload Image", type=["png", "jpg", "jpeg"], accept_multiple_files=True, label_visibility="collapsed")
+        if up_imgs:
+            imgs = [Image.open(f) for f in up_imgs]
+            st.image(imgs, width=300)
             if translate_btn:
-                with st.spinner("OCR en cours..."):
-                    new_input = image_to_text_easyocr(img, target_lang)
+                # OCR par lots (lecteur partagé) ; un paragraphe par ligne, images séparées par une ligne vide
+                progress = st.progress(0.0, text="OCR en cours...")
+                start, texts = time.perf_counter(), []
+                for text in iter_ocr_images(imgs, target_lang):
+                    texts.append(text)
+                    rate = len(texts) / (time.perf_counter() - start)
+                    progress.progress(len(texts) / len(imgs), text=f"Image {len(texts)} / {len(imgs)} ({rate:.1f} image(s)/s)")
+                progress.empty()
+                new_input = "\n\n".join(texts)
 
     with tab_voc:
         up_audio = st.file_uploader("Upload Audio", type=["mp3", "wav"], label_visibility="collapsed")
         if up_audio:
             if translate_btn:
                 with st.spinner("Transcription Whisper..."):
-                    model = whisper.load_model("base")
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                        tmp.write(up_audio.read())
-                        path = tmp.name
-                    res = model.transcribe(path)
-                    new_input = res["text"]
+                    partial = st.empty()
+                    for new_input, audio_lang in transcribe_stream(up_audio.getvalue()):
+                        partial.caption(new_input)
 
     # --- Logique de Traduction ---
-    if translate_btn and (new_input or text_val):
+    if translate_btn and not target_langs:
+        st.warning("Choisissez au moins une langue cible.")
+    elif translate_btn and (new_input or text_val):
         # Utiliser new_input s'il vient d'un fichier/img, sinon text_val
         final_input = new_input if new_input else text_val
         st.session_state['input_text'] = final_input
         
         with st.spinner("L'IA travaille..."):
             # 1. Detect & Translate
-            d_lang, conf = detect_language(final_input)
-            t_text = translate_text(final_input, NLLB_LANGS.get(d_lang, 'en'), NLLB_LANGS[target_lang])
-            st.session_state['translated_text'] = t_text
+            translations = {}
+            if doc_translation is not None and final_input == doc_input:
+                d_lang = doc_lang or 'en'
+                translations[target_lang] = doc_translation
+            elif new_input and audio_lang in NLLB_LANGS:
+                d_lang = audio_lang
+            else:
+                d_lang, conf = detect_language(final_input)
+            others = [lang for lang in target_langs if lang not in translations]
+            if others:
+                # Toutes les cibles en un passage : le texte n'est encodé qu'une fois
+                translated = translate_text(final_input, NLLB_LANGS.get(d_lang, 'en'), [NLLB_LANGS[lang] for lang in others])
+                translations.update({lang: translated[NLLB_LANGS[lang]] for lang in others})
+            translations = {lang: translations[lang] for lang in target_langs}
+            st.session_state['translations'] = translations
             st.session_state['detected_lang'] = d_lang
+            # Segments proches d'une traduction mémorisée (non servis automatiquement) : à relire
+            st.session_state['tm_suggestions'] = {
+                lang: memory_suggestions(final_input, NLLB_LANGS.get(d_lang, 'en'), NLLB_LANGS[lang]) for lang in translations
+            }
 
-            # 2. Generate Audio
-            text_to_speech(final_input, lang=d_lang, filename="source.mp3")
-            text_to_speech(t_text, lang=target_lang, filename="target.mp3")
+            # 2. Generate Audio (en parallèle, affiché après le texte traduit)
+            st.session_state['source_audio'] = synthesize_async(final_input, d_lang)
+            for lang, t_text in translations.items():
+                st.session_state[f'target_audio_{lang}'] = synthesize_async(t_text, lang)
             
             # 3. Save History
-            hist = {
-                "original": final_input, "translated": t_text,
-                "source_lang": d_lang, "target_lang": target_lang,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-            }
-            mode = "r+" if os.path.exists("history.json") else "w"
             try:
-                with open("history.json", mode, encoding="utf-8") as f:
-                    lines = f.readlines() if mode == "r+" else []
-                    lines.append(json.dumps(hist) + "\n")
-                    if mode == "r+": f.seek(0); f.writelines(lines)
-            except: pass
+                for lang, t_text in translations.items():
+                    add_entry(final_input, t_text, d_lang, lang)
+            except sqlite3.Error as e:
+                st.warning(f"Historique non enregistré : {e}")
 
     # --- AFFICHAGE DES RÉSULTATS (Style Split Screen) ---
-    if st.session_state['translated_text']:
+    translations = st.session_state['translations']
+    if translations:
         st.markdown("---")
         
         col_res1, col_res2 = st.columns(2)
@@ -274,19 +420,35 @@ if menu == "Traducteur":
         with col_res1:
             st.markdown(f"**Original ({st.session_state.get('detected_lang', 'auto')})**")
             st.text_area("Source", value=st.session_state['input_text'], height=250, disabled=True, label_visibility="collapsed")
-            # Audio Player minimaliste
-            if os.path.exists("source.mp3"):
-                with open("source.mp3", "rb") as f:
-                    st.audio(f.read(), format="audio/mp3")
 
-        # Bloc Traduction
+        # Bloc Traduction (un onglet par langue cible)
         with col_res2:
-            st.markdown(f"**Traduction ({target_lang})**")
-            st.text_area("Cible", value=st.session_state['translated_text'], height=250, label_visibility="collapsed")
-            # Audio Player minimaliste
-            if os.path.exists("target.mp3"):
-                with open("target.mp3", "rb") as f:
-                    st.audio(f.read(), format="audio/mp3")
+            if len(translations) == 1:
+                lang = next(iter(translations))
+                st.markdown(f"**Traduction ({lang})**")
+                target_boxes = [st.container()]
+            else:
+                st.markdown("**Traductions**")
+                target_boxes = st.tabs(list(translations))
+            for box, (lang, t_text) in zip(target_boxes, translations.items()):
+                with box:
+                    st.text_area(f"Cible ({lang})", value=t_text, height=250, label_visibility="collapsed")
+                    suggestions = st.session_state.get('tm_suggestions', {}).get(lang)
+                    if suggestions:
+                        with st.expander(f"💡 Suggestions de la mémoire ({len(suggestions)})"):
+                            for s in suggestions:
+                                st.caption(f"{s['segment']} → **{s['suggestion']}** (similarité {s['score']:.0%})")
+
+        # Audio Player minimaliste (après les textes : la synthèse peut encore être en cours)
+        with col_res1:
+            source_audio = session_audio('source_audio')
+            if source_audio:
+                st.audio(source_audio, format="audio/mp3")
+        for box, lang in zip(target_boxes, translations):
+            with box:
+                target_audio = session_audio(f'target_audio_{lang}')
+                if target_audio:
+                    st.audio(target_audio, format="audio/mp3")
 
         # Boutons d'export
         # Boutons d'export
@@ -299,50 +461,32 @@ if menu == "Traducteur":
                 c1, c2, c3 = st.columns(3)
                 
                 # Création du dictionnaire d'arguments pour la fonction de sauvegarde
+                # (toutes les langues cibles dans un même fichier)
                 save_args = {
                     "original_text": st.session_state.get('input_text', ''),
-                    "translated_text": st.session_state.get('translated_text', ''),
+                    "translated_text": translations,
                     "source_lang": st.session_state.get('detected_lang', 'auto'),
-                    "target_lang": target_lang  # Cette variable vient du selectbox en haut de la page
+                    "target_lang": next(iter(translations))
                 }
 
-                # On génère les fichiers UNIQUEMENT quand on clique sur le bouton de téléchargement
-                # C'est plus efficace que de les générer à chaque rechargement
-                
-                # --- Bouton TXT ---
-                with c1:
-                    # On crée le fichier .txt en mémoire
-                    save_translation(**save_args, format="txt", filename="t.txt")
-                    # On le lit et on le propose au téléchargement
-                    with open("t.txt", "rb") as file:
-                        st.download_button(
-                            label="⬇️ TXT",
-                            data=file,
-                            file_name="traduction.txt",
-                            mime="text/plain"
-                        )
-                
-                # --- Bouton DOCX ---
-                with c2:
-                    save_translation(**save_args, format="docx", filename="t.docx")
-                    with open("t.docx", "rb") as file:
-                        st.download_button(
-                            label="⬇️ Word",
-                            data=file,
-                            file_name="traduction.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        )
-
-                # --- Bouton PDF ---
-                with c3:
-                    save_translation(**save_args, format="pdf", filename="t.pdf")
-                    with open("t.pdf", "rb") as file:
-                        st.download_button(
-                            label="⬇️ PDF",
-                            data=file,
-                            file_name="traduction.pdf",
-                            mime="application/pdf"
-                        )
+                # On génère chaque format UNIQUEMENT quand on le demande (rendu en mémoire,
+                # mis en cache par contenu : les rechargements suivants ne refont rien)
+                exports = [
+                    (c1, "txt", "⬇️ TXT"),
+                    (c2, "docx", "⬇️ Word"),
+                    (c3, "pdf", "⬇️ PDF"),
+                ]
+                for col, fmt, label in exports:
+                    with col:
+                        key = export_key(**save_args, format=fmt)
+                        if st.session_state.get(f"export_{fmt}") == key or st.button(f"Préparer {fmt.upper()}", key=f"prepare_{fmt}"):
+                            st.session_state[f"export_{fmt}"] = key
+                            st.download_button(
+                                label=label,
+                                data=render_translation(**save_args, format=fmt),
+                                file_name=f"traduction.{fmt}",
+                                mime=MIME_TYPES[fmt]
+                            )
             else:
                 st.caption("Faites une traduction pour pouvoir télécharger les résultats.")
 
@@ -351,11 +495,33 @@ if menu == "Traducteur":
 # --- Page : HISTORIQUE ---
 elif menu == "Historique":
     st.title("📜 Archives")
-    if os.path.exists("history.json"):
-        with open("history.json", "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        for line in lines[::-1]:
-            d = json.loads(line)
+
+    # Filtres
+    f1, f2, f3, f4 = st.columns([3, 1, 1, 2])
+    with f1:
+        search = st.text_input("Rechercher", placeholder="Mot dans l'original ou la traduction...")
+    with f2:
+        f_src = st.selectbox("Source", ["Toutes", "fr", "en", "es", "de", "ar"])
+    with f3:
+        f_tgt = st.selectbox("Cible", ["Toutes", "fr", "en", "es", "de", "ar"])
+    with f4:
+        dates = st.date_input("Période", value=())
+
+    filters = {
+        "query": search,
+        "source_lang": None if f_src == "Toutes" else f_src,
+        "target_lang": None if f_tgt == "Toutes" else f_tgt,
+        "date_from": dates[0] if len(dates) > 0 else None,
+        "date_to": dates[1] if len(dates) > 1 else (dates[0] if len(dates) > 0 else None),
+    }
+    total = count_entries(**filters)
+
+    if total:
+        page_size = 20
+        n_pages = (total - 1) // page_size + 1
+        page = st.number_input(f"Page (sur {n_pages})", min_value=1, max_value=n_pages, value=1) - 1
+        st.caption(f"{total} traduction(s)")
+        for d in get_entries(page=page, page_size=page_size, **filters):
             with st.container():
                 st.markdown(f"""
                 <div style="background: white; padding: 15px; border-radius: 10px; margin-bottom: 10px; border-left: 5px solid #3182ce;">
@@ -485,3 +651,11 @@ elif menu == "Infos":
         </p>
     </div>
     """, unsafe_allow_html=True)
+
+# ==========================================
+# 5. PRÉCHARGEMENT DES MODÈLES
+# ==========================================
+# Après le premier affichage : les modèles de traduction se chargent en arrière-plan (une fois par session)
+if menu == "Traducteur" and not st.session_state.get('models_warmed_up'):
+    warm_up_models(["lang_detector", "nllb"])
+    st.session_state['models_warmed_up'] = True
@@ -0,0 +1,310 @@
+# modules/api_module.py
+# API HTTP locale (JSON / multipart) à côté de l'interface Streamlit.
+# Serveur asyncio sans dépendance : les appels aux modèles tournent dans un pool de threads borné.
+#
+# Lancement : python -m modules.api_module --port 8000 [--warm]
+#
+#   GET  /health                 -> le processus répond
+#   GET  /ready                  -> état de chargement des modèles
+#   GET  /metrics                -> latences par étape et mémoire des modèles (format Prometheus)
+#   POST /translate  (JSON)      {"text", "target_lang", "source_lang"?}  (target_lang : code ou liste de codes)
+#                                -> traduction(s) + "suggestions" de la mémoire de traduction (à relire)
+#   POST /detect     (JSON)      {"text"} ou {"texts": [...]}
+#   POST /ocr        (multipart) champ "image" (+ "lang") ; ou corps brut + ?lang=
+#   POST /transcribe (multipart) champ "audio" ; ou corps brut
+#   POST /export     (JSON)      {"original_text", "translated_text", "source_lang", "target_lang", "format"}
+
+import argparse
+import asyncio
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from urllib.parse import urlsplit, parse_qs
+
+from modules.model_module import model_status, memory_usage, model_metrics_text, is_loaded, warm_up_models
+from modules.metrics_module import prometheus_text
+
+MAX_BODY_BYTES = 50 * 2 ** 20
+READY_MODELS = ["lang_detector", "nllb"]
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class Request:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Corps JSON de la requête : un objet est attendu."""
+        try:
+            payload = json.loads(self.body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise HTTPError(400, f"JSON invalide : {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Le corps JSON doit être un objet")
+        return payload
+
+    def form(self):
+        """Champs d'un corps multipart/form-data : {nom: octets}."""
+        content_type = self.headers.get("content-type", "")
+        if not content_type.startswith("multipart/form-data"):
+            return {}
+        message = BytesParser(policy=default_policy).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + self.body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name:
+                fields[name] = part.get_payload(decode=True) or b""
+        return fields
+
+    def upload(self, field):
+        """Fichier envoyé soit en multipart (champ `field`), soit en corps brut."""
+        form = self.form()
+        data = form.get(field) if form else self.body
+        if not data:
+            raise HTTPError(400, f"Fichier '{field}' manquant")
+        return data, form
+
+# --- Validation des champs JSON (erreur 400 plutôt qu'une exception dans le gestionnaire) ---
+
+def _string(payload, name, default=None):
+    """Champ texte (ou absent / null : `default`)."""
+    value = payload.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise HTTPError(400, f"Champ '{name}' : chaîne attendue")
+    return value
+
+def _string_list(payload, name):
+    """Champ liste de chaînes (ou absent : None)."""
+    value = payload.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise HTTPError(400, f"Champ '{name}' : liste de chaînes attendue")
+    return value
+
+def _string_or_list(payload, name, default=None):
+    """Champ chaîne ou liste de chaînes."""
+    return _string_list(payload, name) if isinstance(payload.get(name), list) else _string(payload, name, default)
+
+# --- Gestionnaires (exécutés dans le pool de threads) ---
+
+def handle_translate(request):
+    from modules.translator_module import translate_text, detect_language, memory_suggestions, NLLB_LANGS
+    payload = request.json()
+    text, target = _string(payload, "text"), _string_or_list(payload, "target_lang", "en")
+    if not text:
+        raise HTTPError(400, "Champ 'text' manquant")
+    targets = target if isinstance(target, list) else [target]
+    if not targets:
+        raise HTTPError(400, "Aucune langue cible")
+    for code in targets:
+        if code not in NLLB_LANGS:
+            raise HTTPError(400, f"Langue cible non supportée : {code}")
+    source = _string(payload, "source_lang") or detect_language(text)[0]
+    if source not in NLLB_LANGS:
+        raise HTTPError(400, f"Langue source non supportée : {source}")
+    if isinstance(target, list):
+        # Multi-cibles : encodeur NLLB exécuté une seule fois
+        translated = translate_text(text, NLLB_LANGS[source], [NLLB_LANGS[code] for code in targets])
+        return {"translations": {code: translated[NLLB_LANGS[code]] for code in targets},
+                "suggestions": {code: memory_suggestions(text, NLLB_LANGS[source], NLLB_LANGS[code]) for code in targets},
+                "source_lang": source, "target_lang": targets}
+    return {"translated_text": translate_text(text, NLLB_LANGS[source], NLLB_LANGS[target]),
+            "suggestions": memory_suggestions(text, NLLB_LANGS[source], NLLB_LANGS[target]),
+            "source_lang": source, "target_lang": target}
+
+def handle_detect(request):
+    from modules.translator_module import detect_languages
+    payload = request.json()
+    text = _string(payload, "text")
+    texts = _string_list(payload, "texts") or ([text] if text else None)
+    if not texts:
+        raise HTTPError(400, "Champ 'text' ou 'texts' manquant")
+    results = [{"lang": lang, "score": score} for lang, score in detect_languages(texts)]
+    return results[0] if "texts" not in payload else {"results": results}
+
+def handle_ocr(request):
+    from PIL import Image, UnidentifiedImageError
+    from modules.ocr_module import image_to_text_easyocr
+    data, form = request.upload("image")
+    lang = (form.get("lang") or b"").decode("utf-8", "replace") or request.query.get("lang", "en")
+    try:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+    except (UnidentifiedImageError, OSError) as e:
+        raise HTTPError(400, f"Image illisible : {e}")
+    return {"text": image_to_text_easyocr(image, lang)}
+
+def handle_transcribe(request):
+    from modules.speech_module import transcribe_audio
+    data, form = request.upload("audio")
+    language = (form.get("language") or b"").decode() or request.query.get("language") or None
+    return transcribe_audio(data, language)
+
+def handle_export(request):
+    from modules.download_module import render_translation, MIME_TYPES
+    payload = request.json()
+    fmt = _string(payload, "format", "txt")
+    if fmt not in MIME_TYPES:
+        raise HTTPError(400, f"Format non supporté : {fmt}")
+    translated = payload.get("translated_text")
+    if isinstance(translated, dict):
+        # Multi-cibles : {langue: traduction}
+        if not all(isinstance(value, str) for value in translated.values()):
+            raise HTTPError(400, "Champ 'translated_text' : chaîne ou objet {langue: chaîne} attendu")
+    else:
+        translated = _string(payload, "translated_text", "")
+    try:
+        data = render_translation(_string(payload, "original_text", ""), translated,
+                                  _string(payload, "source_lang", "auto"), _string(payload, "target_lang", "en"), fmt)
+    except TypeError as e:
+        raise HTTPError(400, str(e))
+    return data, MIME_TYPES[fmt]
+
+ROUTES = {
+    ("POST", "/translate"): handle_translate,
+    ("POST", "/detect"): handle_detect,
+    ("POST", "/ocr"): handle_ocr,
+    ("POST", "/transcribe"): handle_transcribe,
+    ("POST", "/export"): handle_export,
+}
+
+# --- Serveur ---
+
+class APIServer:
+    """Serveur HTTP/1.1 minimal (une requête par connexion) au-dessus d'asyncio."""
+
+    def __init__(self, host="127.0.0.1", port=8000, workers=2, max_pending=16):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.server = None
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Ligne de requête invalide")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Corps de requête trop volumineux")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return Request(method.upper(), url.path, query, headers, body)
+
+    async def _dispatch(self, request):
+        if request.method == "GET" and request.path == "/health":
+            return 200, {"status": "ok"}
+        if request.method == "GET" and request.path == "/metrics":
+            return 200, ((prometheus_text() + model_metrics_text()).encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        if request.method == "GET" and request.path == "/ready":
+            ready = all(is_loaded(name) for name in READY_MODELS)
+            return (200 if ready else 503), {"ready": ready, "pending": self.pending, "models": model_status(),
+                                             "memory": memory_usage()}
+
+        handler = ROUTES.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in ROUTES):
+                raise HTTPError(405, "Méthode non autorisée")
+            raise HTTPError(404, "Route inconnue")
+
+        # Contre-pression : on refuse plutôt que d'empiler sans limite
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, "Serveur occupé, réessayez plus tard")
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, handler, request)
+        finally:
+            self.pending -= 1
+        return 200, result
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                request = await self._read_request(reader)
+                if request is None:
+                    return
+                status, result = await self._dispatch(request)
+            except HTTPError as e:
+                status, result = e.status, {"error": str(e)}
+            except (asyncio.IncompleteReadError, ValueError) as e:
+                status, result = 400, {"error": str(e)}
+            except Exception as e:
+                status, result = 500, {"error": f"{type(e).__name__}: {e}"}
+
+            if isinstance(result, tuple):
+                body, content_type = result
+            else:
+                body, content_type = json.dumps(result, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+            head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n")
+            writer.write(head.encode("latin-1") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # port réel si 0
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP locale de traduction.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="Appels modèles simultanés")
+    parser.add_argument("--max-pending", type=int, default=16, help="Requêtes en cours max avant 503")
+    parser.add_argument("--warm", action="store_true", help="Précharger les modèles de traduction au démarrage")
+    args = parser.parse_args(argv)
+
+    # Enregistre les chargeurs de modèles pour /ready ; requêtes concurrentes regroupées en micro-lots
+    from modules.translator_module import enable_scheduler
+    enable_scheduler()
+    if args.warm:
+        warm_up_models(READY_MODELS)
+
+    server = APIServer(args.host, args.port, args.workers, args.max_pending)
+    print(f"API en écoute sur http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# modules/batch_module.py
+# Traduction de fichiers en lot, sans interface Streamlit.
+#
+# Exemple :
+#   python -m modules.batch_module docs/ rapport.pdf -t en fr -o sortie/ --workers 4
+#
+# Un manifeste JSONL (sortie/manifest.jsonl par défaut) enregistre chaque fichier terminé :
+# une exécution interrompue reprend là où elle s'était arrêtée.
+# Les processus partagent le cache et la mémoire de traduction (SQLite en mode WAL,
+# attente des verrous bornée par cache_module.DB_TIMEOUT).
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+SUPPORTED_TYPES = ("txt", "pdf", "docx")
+
+def collect_files(inputs):
+    """Renvoie [(chemin, chemin relatif de sortie)] pour les fichiers et dossiers donnés."""
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for f in sorted(path.rglob("*")):
+                if f.is_file() and f.suffix[1:].lower() in SUPPORTED_TYPES:
+                    files.append((f, f.relative_to(path)))
+        elif path.is_file() and path.suffix[1:].lower() in SUPPORTED_TYPES:
+            files.append((path, Path(path.name)))
+    return files
+
+def load_manifest(manifest_path):
+    """Ensemble des (fichier, langue cible) déjà traduits."""
+    done = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # ligne tronquée par une interruption
+                if record.get("status") == "done":
+                    done.add((record["file"], record["target"]))
+    return done
+
+# --- Côté processus de traitement ---
+
+def _init_worker(threads):
+    """Chaque processus garde sa propre copie des modèles et un nombre de threads limité."""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    # Le parallélisme est déjà entre fichiers : pas de pool d'extraction / d'OCR imbriqué
+    from modules import file_module
+    file_module.PARALLEL_MIN_PAGES = float("inf")
+    file_module.OCR_WORKERS = 0
+
+def translate_file(file_path, target, output_path, fmt, keep_layout=False):
+    """Traduit un fichier et écrit l'export ; renvoie l'enregistrement du manifeste."""
+    from modules.file_module import file_translate, translate_docx
+    from modules.download_module import save_translation
+
+    start = time.perf_counter()
+    file_type = Path(file_path).suffix[1:].lower()
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    if keep_layout and file_type == "docx":
+        docx_stats = translate_docx(file_path, output_path, target)
+        chars, ocr_pages = None, 0
+        extra = {key: docx_stats[key] for key in ("paragraphs", "skipped_paragraphs", "segments", "unique_segments")}
+    else:
+        result = file_translate(file_path, file_type, target)
+        save_translation(result["original_text"], result["translated_text"],
+                         result["source_lang"] or "auto", target, format=fmt, filename=output_path)
+        chars = len(result["original_text"])
+        ocr_pages = sum(1 for page in result["pages"] if page["mode"] == "ocr")
+        extra = {}
+
+    return {
+        "file": str(file_path), "target": target, "status": "done", "output": str(output_path),
+        "chars": chars, "ocr_pages": ocr_pages, "seconds": round(time.perf_counter() - start, 2), **extra,
+    }
+
+def _run_item(file_path, target, output_path, fmt, keep_layout):
+    try:
+        return translate_file(file_path, target, output_path, fmt, keep_layout)
+    except Exception as e:
+        return {"file": str(file_path), "target": target, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+# --- Orchestration ---
+
+def run(inputs, targets, output_dir, fmt="txt", workers=1, threads=None, manifest=None, keep_layout=False):
+    manifest = manifest or os.path.join(output_dir, "manifest.jsonl")
+    os.makedirs(output_dir, exist_ok=True)
+    done = load_manifest(manifest)
+
+    jobs, outputs = [], {}
+    for file_path, relative in collect_files(inputs):
+        for target in targets:
+            out_fmt = "docx" if keep_layout and file_path.suffix.lower() == ".docx" else fmt
+            # L'extension source reste dans le nom : rapport.pdf et rapport.docx -> rapport.pdf.en.txt / rapport.docx.en.txt
+            output_path = Path(output_dir) / relative.parent / f"{relative.name}.{target}.{out_fmt}"
+            if outputs.setdefault(output_path, file_path) != file_path:
+                raise ValueError(f"{outputs[output_path]} et {file_path} donneraient le même fichier de sortie "
+                                 f"({output_path}) : traduisez-les séparément ou passez leur dossier parent")
+            if (str(file_path), target) in done:
+                continue
+            jobs.append((str(file_path), target, str(output_path), out_fmt, keep_layout))
+
+    print(f"{len(jobs)} traduction(s) à faire, {len(done)} déjà faite(s) (manifeste : {manifest})")
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    stats = {"done": 0, "error": 0, "chars": 0}
+    start = time.perf_counter()
+
+    with open(manifest, "a", encoding="utf-8") as log, ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads,),
+    ) as pool:
+        futures = [pool.submit(_run_item, *job) for job in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            log.write(json.dumps(record, ensure_ascii=False) + "\n")
+            log.flush()
+            stats[record["status"]] += 1
+            stats["chars"] += record.get("chars") or 0
+            status = record.get("output") or record.get("error")
+            print(f"[{stats['done'] + stats['error']}/{len(jobs)}] {record['file']} -> {record['target']} : {status}")
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["files_per_second"] = round(stats["done"] / elapsed, 3) if elapsed else 0.0
+    stats["chars_per_second"] = round(stats["chars"] / elapsed, 1) if elapsed else 0.0
+    print(f"Terminé : {stats['done']} traduit(s), {stats['error']} erreur(s) en {stats['seconds']} s "
+          f"({stats['files_per_second']} fichiers/s, {stats['chars_per_second']} caractères/s)")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Traduction de fichiers txt/pdf/docx en lot.")
+    parser.add_argument("inputs", nargs="+", help="Fichiers ou dossiers à traduire")
+    parser.add_argument("-t", "--targets", nargs="+", required=True, help="Langues cibles (fr en es de ar)")
+    parser.add_argument("-o", "--output-dir", default="traductions", help="Dossier de sortie")
+    parser.add_argument("-f", "--format", default="txt", choices=["txt", "docx", "pdf"], help="Format d'export")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Nombre de processus (une copie des modèles chacun)")
+    parser.add_argument("--threads", type=int, default=None, help="Threads PyTorch par processus (défaut : cœurs / workers)")
+    parser.add_argument("--manifest", default=None, help="Manifeste JSONL de reprise (défaut : <sortie>/manifest.jsonl)")
+    parser.add_argument("--keep-layout", action="store_true", help="DOCX -> DOCX en conservant la mise en page")
+    args = parser.parse_args(argv)
+
+    from modules.translator_module import NLLB_LANGS
+    unknown = [t for t in args.targets if t not in NLLB_LANGS]
+    if unknown:
+        parser.error(f"Langue(s) non supportée(s) : {', '.join(unknown)}")
+
+    try:
+        stats = run(args.inputs, args.targets, args.output_dir, args.format, args.workers,
+                    args.threads, args.manifest, args.keep_layout)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if stats["error"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
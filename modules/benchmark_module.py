@@ -0,0 +1,419 @@
+# modules/benchmark_module.py
+# Banc de mesure hors ligne de chaque étape (inférence et E/S).
+# Les vrais modèles sont remplacés par de minuscules modèles de même architecture,
+# initialisés aléatoirement (M2M100/NLLB, XLM-R, GPT-2, Whisper) : aucun téléchargement.
+#
+# Utilisation :
+#   python -m modules.benchmark_module -o bench.json
+#   python -m modules.benchmark_module -o new.json --compare bench.json   (code 1 si régression)
+#   python -m modules.benchmark_module --only translate export --repeat 10
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from modules.model_module import rss_bytes
+from modules.quality_module import SAMPLE
+
+# Tailles testées par étape (phrases, secondes d'audio, pages, paragraphes, écritures...)
+SIZES = {
+    "translate": [1, 8, 32],
+    "translate_multi": [1, 8, 32],
+    "detect_fast": [1, 16, 64],
+    "detect_model": [1, 16, 64],
+    "chatbot": [1, 4],
+    "whisper": [5, 40],
+    "ocr": [1, 4],
+    "read_pdf": [1, 10, 50],
+    "read_docx": [10, 100, 500],
+    "export_txt": [8, 128],
+    "export_docx": [8, 128],
+    "export_pdf": [8, 128],
+    "history_write": [1, 50],
+    "memory_lookup": [1000, 20000],
+    "memory_suggest": [1000, 20000],
+}
+
+LANG_CODES = ["fra_Latn", "eng_Latn", "spa_Latn", "deu_Latn", "arb_Arab"]
+DETECTOR_LABELS = ["ar", "bg", "de", "el", "en", "es", "fr", "hi", "it", "ja",
+                   "nl", "pl", "pt", "ru", "sw", "th", "tr", "ur", "vi", "zh"]
+
+
+def fixture_sentences(n):
+    """n phrases (françaises) tirées de l'échantillon fixe, numérotées pour qu'elles soient distinctes."""
+    return [f"{SAMPLE[i % len(SAMPLE)][0]} ({i})" for i in range(n)]
+
+
+# --- Mesure ---
+
+class PeakRSS:
+    """Échantillonne la mémoire résidente pendant un bloc et garde le maximum."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+def percentile(values, q):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+def measure(fn, units, repeat=5, warmup=1, setup=None):
+    """Exécute `fn` (après `setup` éventuel, non chronométré) et renvoie les statistiques."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    latencies = []
+    with PeakRSS() as rss:
+        for _ in range(repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+    mean = statistics.mean(latencies)
+    return {
+        "repeat": repeat,
+        "mean_ms": round(1000 * mean, 3),
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 3),
+        "p90_ms": round(1000 * percentile(latencies, 0.90), 3),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 3),
+        "units_per_second": round(units / mean, 2) if mean else None,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+    }
+
+
+# --- Modèles miniatures (initialisés aléatoirement, hors ligne) ---
+
+def tiny_tokenizer(extra_tokens=(), model_max_length=512):
+    """Tokenizer WordLevel construit sur le vocabulaire des fixtures (+ codes de langue)."""
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    pre = pre_tokenizers.Whitespace()
+    words = sorted({w for src, ref in SAMPLE for text in (src, ref) for w, _ in pre.pre_tokenize_str(text.lower())})
+    words += [str(i) for i in range(10)] + ["(", ")"]
+    vocab = {tok: i for i, tok in enumerate(["<s>", "<pad>", "</s>", "<unk>", *extra_tokens, *dict.fromkeys(words)])}
+
+    backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    backend.normalizer = normalizers.Lowercase()
+    backend.pre_tokenizer = pre
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", pad_token="<pad>", eos_token="</s>", unk_token="<unk>",
+        model_max_length=model_max_length,
+    )
+
+def tiny_nllb():
+    from transformers import M2M100Config, M2M100ForConditionalGeneration
+    tokenizer = tiny_tokenizer(LANG_CODES)
+    config = M2M100Config(
+        vocab_size=len(tokenizer), d_model=32, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=64, decoder_ffn_dim=64,
+        max_position_embeddings=1024, pad_token_id=1, bos_token_id=0, eos_token_id=2, decoder_start_token_id=2,
+    )
+    return tokenizer, M2M100ForConditionalGeneration(config).eval()
+
+def tiny_lang_detector():
+    from transformers import XLMRobertaConfig, XLMRobertaForSequenceClassification, pipeline
+    tokenizer = tiny_tokenizer()
+    config = XLMRobertaConfig(
+        vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, pad_token_id=1, bos_token_id=0, eos_token_id=2,
+        id2label=dict(enumerate(DETECTOR_LABELS)), label2id={l: i for i, l in enumerate(DETECTOR_LABELS)},
+    )
+    model = XLMRobertaForSequenceClassification(config).eval()
+    return pipeline("text-classification", model=model, tokenizer=tokenizer, device=-1)
+
+def tiny_dialogpt():
+    from transformers import GPT2Config, GPT2LMHeadModel
+    tokenizer = tiny_tokenizer()
+    config = GPT2Config(vocab_size=len(tokenizer), n_positions=1024, n_embd=32, n_layer=2, n_head=2,
+                        bos_token_id=2, eos_token_id=2)
+    return tokenizer, GPT2LMHeadModel(config).eval()
+
+def tiny_whisper():
+    from whisper.model import ModelDimensions, Whisper
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=32, n_audio_head=2, n_audio_layer=2,
+        n_vocab=51865, n_text_ctx=448, n_text_state=32, n_text_head=2, n_text_layer=2,
+    )
+    return Whisper(dims).eval()
+
+def install_tiny_models():
+    """Remplace les chargeurs des vrais modèles par les modèles miniatures."""
+    from modules.model_module import register_model
+    from modules import snapshot_module
+    import modules.translator_module  # noqa: F401  (enregistre d'abord les vrais chargeurs)
+    snapshot_module.SNAPSHOT_DIR = None  # les instantanés des vrais modèles ne doivent pas être utilisés
+    register_model("nllb", tiny_nllb)
+    register_model("lang_detector", tiny_lang_detector)
+    register_model("dialogpt", tiny_dialogpt)
+    register_model("whisper", tiny_whisper)
+
+
+# --- Fixtures ---
+
+def make_pdf(path, pages):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=11)
+    for p in range(pages):
+        pdf.add_page()
+        for sentence in fixture_sentences(20):
+            pdf.multi_cell(0, 6, sentence.encode("latin-1", "replace").decode("latin-1"), new_x="LMARGIN", new_y="NEXT")
+    pdf.output(path)
+
+def make_docx(path, paragraphs):
+    from docx import Document
+    doc = Document()
+    for sentence in fixture_sentences(paragraphs):
+        doc.add_paragraph(sentence)
+    doc.save(path)
+
+
+# --- Étapes ---
+
+def _isolated_translator(workdir):
+    """
+    Cache et mémoire de traduction dans le dossier de travail (les sorties des modèles miniatures
+    ne doivent pas atteindre les bases réelles) ; renvoie le module et la fonction qui les vide.
+    """
+    from modules import translator_module as tm
+    from modules.cache_module import TranslationCache
+    from modules.memory_module import TranslationMemory
+    tm.cache = TranslationCache(os.path.join(workdir, "cache.db"))
+    tm.memory = TranslationMemory(os.path.join(workdir, "tm.db"))
+
+    def clear():
+        tm.cache.clear()
+        tm.memory.clear()
+    return tm, clear
+
+def bench_translate(size, repeat, workdir):
+    tm, clear = _isolated_translator(workdir)
+    text = " ".join(fixture_sentences(size))
+    return measure(lambda: tm.translate_text(text, "fra_Latn", "eng_Latn", max_length=64),
+                   units=size, repeat=repeat, setup=clear)
+
+def bench_translate_multi(size, repeat, workdir):
+    """Les quatre autres langues de NLLB_LANGS en un seul passage (encodeur exécuté une fois)."""
+    tm, clear = _isolated_translator(workdir)
+    text = " ".join(fixture_sentences(size))
+    targets = [code for code in tm.NLLB_LANGS.values() if code != "fra_Latn"]
+    return measure(lambda: tm.translate_text(text, "fra_Latn", targets, max_length=64),
+                   units=size * len(targets), repeat=repeat, setup=clear)
+
+def _bench_detect(size, repeat, workdir, threshold):
+    tm, clear = _isolated_translator(workdir)
+    texts = fixture_sentences(size)
+    return measure(lambda: tm.detect_languages(texts, threshold=threshold),
+                   units=size, repeat=repeat, setup=clear)
+
+def bench_detect_fast(size, repeat, workdir):
+    return _bench_detect(size, repeat, workdir, threshold=0.0)     # toujours le niveau rapide
+
+def bench_detect_model(size, repeat, workdir):
+    return _bench_detect(size, repeat, workdir, threshold=1.01)    # toujours xlm-roberta
+
+def bench_chatbot(size, repeat, workdir):
+    from modules.chatbot_module import Conversation
+    prompts = fixture_sentences(size)
+
+    def run():
+        conversation = Conversation(max_new_tokens=16)
+        for prompt in prompts:
+            conversation.reply(prompt)
+    return measure(run, units=size, repeat=repeat)
+
+def bench_whisper(size, repeat, workdir):
+    import numpy as np
+    from modules.speech_module import transcribe_audio, SAMPLE_RATE
+    t = np.arange(size * SAMPLE_RATE) / SAMPLE_RATE
+    audio = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    return measure(lambda: transcribe_audio(audio, language="fr"), units=size, repeat=repeat)
+
+def bench_ocr(size, repeat, workdir):
+    # EasyOCR n'a pas de constructeur "à vide" : mesuré seulement si ses modèles sont déjà en cache local
+    models_dir = os.path.join(os.path.expanduser("~"), ".EasyOCR", "model")
+    if not os.path.isdir(models_dir) or not os.listdir(models_dir):
+        return {"skipped": "modèles EasyOCR absents (~/.EasyOCR/model)"}
+    from PIL import Image, ImageDraw
+    from modules.ocr_module import image_to_text_easyocr, readtext_batched
+    images = []
+    for sentence in fixture_sentences(size):
+        image = Image.new("RGB", (640, 80), "white")
+        ImageDraw.Draw(image).text((10, 30), sentence, fill="black")
+        images.append(image)
+    if size == 1:
+        return measure(lambda: image_to_text_easyocr(images[0], "fr"), units=1, repeat=repeat)
+    return measure(lambda: readtext_batched(images, "fr"), units=size, repeat=repeat)
+
+def bench_read_pdf(size, repeat, workdir):
+    from modules.file_module import read_pdf
+    path = os.path.join(workdir, f"fixture_{size}.pdf")
+    make_pdf(path, size)
+    return measure(lambda: read_pdf(path), units=size, repeat=repeat)
+
+def bench_read_docx(size, repeat, workdir):
+    from modules.file_module import read_docx
+    path = os.path.join(workdir, f"fixture_{size}.docx")
+    make_docx(path, size)
+    return measure(lambda: read_docx(path), units=size, repeat=repeat)
+
+def _bench_export(fmt, size, repeat, workdir):
+    from modules import download_module
+    save = {"txt": download_module.save_txt, "docx": download_module.save_docx, "pdf": download_module.save_pdf}[fmt]
+    original = "\n".join(fixture_sentences(size))
+    translated = "\n".join(ref for _, ref in (SAMPLE * (size // len(SAMPLE) + 1))[:size])
+    path = os.path.join(workdir, f"export.{fmt}")
+    # Cache d'exports vidé à chaque itération : on mesure le rendu
+    return measure(lambda: save(original, translated, "fr", "en", path),
+                   units=size, repeat=repeat, setup=download_module._exports.clear)
+
+def bench_export_txt(size, repeat, workdir):
+    return _bench_export("txt", size, repeat, workdir)
+
+def bench_export_docx(size, repeat, workdir):
+    return _bench_export("docx", size, repeat, workdir)
+
+def bench_export_pdf(size, repeat, workdir):
+    return _bench_export("pdf", size, repeat, workdir)
+
+def bench_history_write(size, repeat, workdir):
+    from modules import history_module
+    history_module.HISTORY_DB = os.path.join(workdir, "history.db")
+    history_module.LEGACY_JSON = os.path.join(workdir, "history.json")
+    history_module._db = None
+    entries = list(zip(fixture_sentences(size), fixture_sentences(size)))
+
+    def run():
+        for original, translated in entries:
+            history_module.add_entry(original, translated, "fr", "en")
+    return measure(run, units=size, repeat=repeat)
+
+def _memory_fixture(size, workdir):
+    """Mémoire de `size` segments distincts et 100 requêtes (segments mémorisés, ponctuation modifiée)."""
+    import random
+    from modules.memory_module import TranslationMemory
+    rng = random.Random(0)
+    # Vocabulaire synthétique (syllabes) : des documents réels ont des milliers de mots distincts
+    syllables = ["ba", "co", "di", "fa", "gu", "la", "me", "no", "pi", "ra", "se", "tu", "ve", "an", "on", "er"]
+    words = ["".join(rng.choices(syllables, k=rng.randint(1, 4))) for _ in range(5000)]
+    segments = [" ".join(rng.choices(words, k=12)).capitalize() + "." for _ in range(size)]
+    memory = TranslationMemory(os.path.join(workdir, f"memory_{size}.db"))
+    memory.add_many([(s, s) for s in segments], "fra_Latn", "eng_Latn")
+    queries = [s[:-1] + " !" for s in segments[:100]]
+    return memory, queries
+
+def bench_memory_lookup(size, repeat, workdir):
+    """Recherche (mêmes mots, ponctuation différente) de 100 segments dans une mémoire de `size` segments."""
+    memory, queries = _memory_fixture(size, workdir)
+    return measure(lambda: memory.lookup_many(queries, "fra_Latn", "eng_Latn"), units=len(queries), repeat=repeat)
+
+def bench_memory_suggest(size, repeat, workdir):
+    """Suggestions (similarité de trigrammes) pour 100 segments dans une mémoire de `size` segments."""
+    memory, queries = _memory_fixture(size, workdir)
+    return measure(lambda: memory.suggest_many(queries, "fra_Latn", "eng_Latn"), units=len(queries), repeat=repeat)
+
+STAGES = {name[len("bench_"):]: fn for name, fn in list(globals().items()) if name.startswith("bench_")}
+
+
+# --- Exécution / comparaison ---
+
+def run_benchmarks(stages=None, repeat=5, threads=1):
+    import torch
+    torch.manual_seed(0)
+    torch.set_num_threads(threads)
+    install_tiny_models()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for stage in stages or list(STAGES):
+            results[stage] = {}
+            for size in SIZES[stage]:
+                try:
+                    results[stage][str(size)] = STAGES[stage](size, repeat, workdir)
+                except ImportError as e:
+                    results[stage][str(size)] = {"skipped": f"dépendance absente : {e.name}"}
+                except Exception as e:
+                    results[stage][str(size)] = {"error": f"{type(e).__name__}: {e}"}
+                print(stage, size, results[stage][str(size)])
+
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "threads": threads,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, metric="p50_ms", tolerance=0.10):
+    """Liste les étapes dont `metric` s'est dégradée de plus de `tolerance` par rapport à la référence."""
+    regressions = []
+    for stage, sizes in current["results"].items():
+        for size, stats in sizes.items():
+            before = baseline.get("results", {}).get(stage, {}).get(size, {})
+            if metric not in stats or metric not in before or not before[metric]:
+                continue
+            change = stats[metric] / before[metric] - 1
+            flag = "RÉGRESSION" if change > tolerance else ""
+            print(f"{stage:14} {size:>5}  {before[metric]:>10.2f} -> {stats[metric]:>10.2f} ms  {change:+7.1%} {flag}")
+            if change > tolerance:
+                regressions.append((stage, size, round(change, 4)))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de mesure hors ligne (modèles miniatures).")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="Fichier JSON de résultats")
+    parser.add_argument("--only", nargs="+", choices=list(STAGES), help="Étapes à mesurer")
+    parser.add_argument("--repeat", type=int, default=5, help="Itérations chronométrées par mesure")
+    parser.add_argument("--threads", type=int, default=1, help="Threads PyTorch (fixé pour la reproductibilité)")
+    parser.add_argument("--compare", help="Résultats de référence (JSON) à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Dégradation p50 tolérée (0.10 = 10 %%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.only, args.repeat, args.threads)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), tolerance=args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
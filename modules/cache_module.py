@@ -0,0 +1,145 @@
+# modules/cache_module.py
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+CACHE_DB = "translation_cache.db"
+# Attente maximale (secondes) d'un verrou SQLite : la base est partagée entre processus (traduction en lot)
+DB_TIMEOUT = 30
+
+
+def normalize_text(text):
+    """Normalise un texte pour la clé de cache (Unicode NFC, espaces compactés, lignes conservées)."""
+    text = unicodedata.normalize("NFC", text)
+    return "\n".join(re.sub(r"[ \t]+", " ", line).strip() for line in text.strip().split("\n"))
+
+
+def make_key(kind, text, *parts):
+    """Clé = type d'opération + hash du texte normalisé + paramètres (codes NLLB...)."""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return "|".join([kind, digest, *parts])
+
+
+class TranslationCache:
+    """
+    Cache à deux niveaux :
+    - LRU en mémoire (borné par `max_memory_items`)
+    - stockage SQLite local persistant (borné par `max_disk_items` et `ttl` en secondes)
+    Les valeurs doivent être sérialisables en JSON.
+    """
+
+    def __init__(self, db_path=CACHE_DB, max_memory_items=2048, max_disk_items=200000, ttl=30 * 24 * 3600):
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.writes_since_cleanup = 0
+
+        self.db = sqlite3.connect(db_path, timeout=DB_TIMEOUT, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+        self.db.commit()
+
+    # --- Niveau mémoire ---
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    # --- API ---
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Renvoie {clé: valeur} pour les clés présentes (mémoire puis disque)."""
+        found, missing = {}, []
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                    self.hits["memory"] += 1
+                else:
+                    missing.append(key)
+
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self.db.execute(
+                    f"SELECT key, value, created FROM cache WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, value, created in rows:
+                    if now - created > self.ttl:
+                        continue
+                    found[key] = json.loads(value)
+                    self._remember(key, found[key])
+                    self.hits["disk"] += 1
+                if rows:
+                    self.db.executemany("UPDATE cache SET accessed=? WHERE key=?", [(now, r[0]) for r in rows])
+            self.db.commit()
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        now = time.time()
+        with self.lock:
+            for key, value in items.items():
+                self._remember(key, value)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), now, now) for key, value in items.items()]
+            )
+            self.writes_since_cleanup += len(items)
+            if self.writes_since_cleanup >= 1000:
+                self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la limite."""
+        self.writes_since_cleanup = 0
+        self.db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        self.db.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_items,)
+        )
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.db.execute("DELETE FROM cache")
+            self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            disk_items = self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+            return {
+                "memory_items": len(self.memory),
+                "disk_items": disk_items,
+                "memory_hits": self.hits["memory"],
+                "disk_hits": self.hits["disk"],
+                "misses": self.misses,
+                "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            }
@@ -1,39 +1,131 @@
 import streamlit as st
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from modules.model_module import register_model, get_model, apply_precision
+from modules.metrics_module import timed, count_tokens
 
-# Chargement du modèle DialoGPT-medium
-@st.cache_resource  # pour cacher le modèle et ne pas le recharger à chaque run
-def load_model():
+# Chargement du modèle DialoGPT-medium (à la première question seulement)
+def load_model(precision=None):
+    from transformers import AutoModelForCausalLM, AutoTokenizer
     tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
     model = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium")
-    return tokenizer, model
+    return tokenizer, apply_precision(model, precision)
 
-tokenizer, model = load_model()
+register_model("dialogpt", load_model, "Assistant IA (DialoGPT-medium)")
+
+# Budget de contexte (tokens gardés de la conversation) et longueur max d'une réponse
+MAX_CONTEXT_TOKENS = 512
+MAX_NEW_TOKENS = 128
+
+def _sample(logits, temperature=0.7, top_k=50, top_p=0.95):
+    """Échantillonnage top-k / top-p sur les logits du dernier token."""
+    import torch
+    values, indices = torch.topk(logits / temperature, min(top_k, logits.shape[-1]))
+    probs = torch.softmax(values, dim=-1)
+    # top-p : on garde les tokens (triés) tant que la masse cumulée précédente est < top_p
+    probs = probs * ((probs.cumsum(-1) - probs) < top_p)
+    return indices[torch.multinomial(probs / probs.sum(), 1)].item()
+
+class Conversation:
+    """
+    Conversation multi-tours avec DialoGPT.
+    Les past_key_values sont conservés entre les tours : seuls les nouveaux tokens
+    sont encodés. Quand le contexte dépasse le budget, les plus anciens tours sont
+    retirés et le contexte restant est réencodé une fois.
+    """
+
+    def __init__(self, max_context_tokens=MAX_CONTEXT_TOKENS, max_new_tokens=MAX_NEW_TOKENS):
+        self.max_context_tokens = max_context_tokens
+        self.max_new_tokens = max_new_tokens
+        self.turns = []      # tokens de chaque tour (terminés par eos)
+        self.past = None     # KV-cache de tous les tokens déjà passés dans le modèle
+        self.pending = []    # tokens du contexte pas encore dans le cache
+
+    def load_history(self, messages):
+        """Reconstruit le contexte à partir de st.session_state["chat_history"]."""
+        tokenizer, _ = get_model("dialogpt")
+        self.turns = [tokenizer.encode(m["content"] + tokenizer.eos_token) for m in messages]
+        self.past = None
+        self.pending = [t for turn in self.turns for t in turn]
+        self._trim(0)
+
+    def _context_length(self):
+        return sum(len(turn) for turn in self.turns)
+
+    def _trim(self, incoming):
+        """Retire les plus anciens tours pour que contexte + question + réponse tiennent dans le budget."""
+        budget = self.max_context_tokens - self.max_new_tokens - incoming
+        if self._context_length() <= budget:
+            return
+        while self.turns and self._context_length() > budget:
+            self.turns.pop(0)
+        # Les positions ont changé : le cache n'est plus valable
+        self.past = None
+        self.pending = [t for turn in self.turns for t in turn]
+
+    @timed("chatbot")
+    def reply_stream(self, prompt, temperature=0.7, top_k=50, top_p=0.95):
+        """Générateur : renvoie la réponse morceau par morceau, au fil des tokens."""
+        import torch
+        tokenizer, model = get_model("dialogpt")
+        eos = tokenizer.eos_token_id
+
+        # Question trop longue : seuls ses derniers tokens sont gardés (coût d'un tour borné,
+        # et jamais plus de positions que le modèle n'en accepte)
+        prompt_ids = tokenizer.encode(prompt + tokenizer.eos_token)[-(self.max_context_tokens - self.max_new_tokens):]
+        self._trim(len(prompt_ids))
+        self.turns.append(prompt_ids)
+
+        input_ids = torch.tensor([self.pending + prompt_ids])
+        self.pending = []
+        reply, text = [], ""
+        try:
+            for step in range(self.max_new_tokens):
+                with torch.no_grad():
+                    out = model(input_ids=input_ids, past_key_values=self.past, use_cache=True)
+                self.past = out.past_key_values
+                logits = out.logits[0, -1].float()
+                if step == 0:
+                    logits[eos] = -float("inf")  # pas de réponse vide
+                next_id = _sample(logits, temperature, top_k, top_p)
+                reply.append(next_id)
+                if next_id == eos:
+                    break
+                decoded = tokenizer.decode(reply, skip_special_tokens=True)
+                yield decoded[len(text):]
+                text = decoded
+                input_ids = torch.tensor([[next_id]])
+        finally:
+            # Le dernier token échantillonné n'est pas encore dans le cache ; le tour se termine par eos
+            if reply and reply[-1] != eos:
+                self.pending = [reply[-1], eos]
+                reply.append(eos)
+            elif reply:
+                self.pending = [eos]
+            count_tokens("chatbot", len(reply))
+            if reply:
+                self.turns.append(reply)
+            else:
+                # Échec avant le premier token : on repart du contexte sans cache
+                self.turns.pop()
+                self.past = None
+                self.pending = [t for turn in self.turns for t in turn]
+
+    def reply(self, prompt, **kwargs):
+        return "".join(self.reply_stream(prompt, **kwargs))
 
 # Initialisation de l'historique
 def init_chat_session():
     if "chat_history" not in st.session_state:
         st.session_state["chat_history"] = []
+    if "conversation" not in st.session_state:
+        conversation = Conversation()
+        if st.session_state["chat_history"]:
+            conversation.load_history(st.session_state["chat_history"])
+        st.session_state["conversation"] = conversation
 
 # Fonction qui génère la réponse
-def chatbot_response(prompt):
-    # Encodage
-    input_ids = tokenizer.encode(prompt + tokenizer.eos_token, return_tensors="pt")
-    
-    # Historique du chat
-    chat_history_ids = model.generate(
-        input_ids,
-        max_length=1000,
-        pad_token_id=tokenizer.eos_token_id,
-        do_sample=True,
-        top_k=50,
-        top_p=0.95,
-        temperature=0.7
-    )
-    # Décodage
-    response = tokenizer.decode(chat_history_ids[:, input_ids.shape[-1]:][0], skip_special_tokens=True)
-    return response
+def chatbot_response(prompt, conversation=None):
+    conversation = conversation or Conversation()
+    return conversation.reply(prompt)
 
 # Interface Streamlit
 def chat_interface():
@@ -51,10 +143,9 @@ def chat_interface():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Générer réponse
-        answer = chatbot_response(prompt)
+        # Générer la réponse en streaming (tokens affichés au fil de l'eau)
+        with st.chat_message("assistant"):
+            answer = st.write_stream(st.session_state["conversation"].reply_stream(prompt))
 
         # Ajouter la réponse à l'historique
         st.session_state["chat_history"].append({"role": "assistant", "content": answer})
-        with st.chat_message("assistant"):
-            st.markdown(answer)
\ No newline at end of file
@@ -1,25 +1,45 @@
 # modules/download_module.py
 
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
 from docx import Document
 from docx.shared import Pt
 from fpdf import FPDF
 
-# --- Fonctions spécifiques à chaque format ---
+from modules.metrics_module import span
 
-def save_txt(original_text, translated_text, source_lang, target_lang, filename):
-    """Crée un fichier TXT formaté."""
-    content = (
-        f"--- Original ({source_lang.upper()}) ---\n"
-        f"{original_text}\n\n"
-        f"--- Traduction ({target_lang.upper()}) ---\n"
-        f"{translated_text}"
-    )
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(content)
-    return filename
+# Types MIME des exports
+MIME_TYPES = {
+    "txt": "text/plain",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
 
-def save_docx(original_text, translated_text, source_lang, target_lang, filename):
-    """Crée un fichier DOCX formaté."""
+# --- Rendu en mémoire, un format à la fois ---
+
+def _translations(translated_text, target_lang):
+    """
+    Liste des (langue, traduction) à exporter : `translated_text` est soit un texte
+    (langue `target_lang`), soit un dictionnaire {langue: texte} (traduction multi-cibles).
+    """
+    if isinstance(translated_text, dict):
+        return list(translated_text.items())
+    return [(target_lang, translated_text)]
+
+def render_txt(original_text, translated_text, source_lang, target_lang):
+    """Rend l'export TXT (octets UTF-8)."""
+    content = f"--- Original ({source_lang.upper()}) ---\n{original_text}"
+    for lang, text in _translations(translated_text, target_lang):
+        content += f"\n\n--- Traduction ({lang.upper()}) ---\n{text}"
+    return content.encode("utf-8")
+
+def render_docx(original_text, translated_text, source_lang, target_lang):
+    """Rend l'export DOCX dans un buffer mémoire."""
     doc = Document()
     
     # Titre pour le texte original
@@ -29,58 +49,135 @@ def save_docx(original_text, translated_text, source_lang, target_lang, filename
     # Contenu original
     doc.add_paragraph(original_text)
     
-    # Espace
-    doc.add_paragraph() 
-    
-    # Titre pour la traduction
-    p2_heading = doc.add_paragraph()
-    p2_heading.add_run(f"Traduction ({target_lang.upper()})").bold = True
-    
-    # Contenu traduit
-    doc.add_paragraph(translated_text)
+    for lang, text in _translations(translated_text, target_lang):
+        # Espace
+        doc.add_paragraph() 
+
+        # Titre pour la traduction
+        p2_heading = doc.add_paragraph()
+        p2_heading.add_run(f"Traduction ({lang.upper()})").bold = True
+
+        # Contenu traduit
+        doc.add_paragraph(text)
     
-    doc.save(filename)
-    return filename
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
 
-def save_pdf(original_text, translated_text, source_lang, target_lang, filename):
-    """Crée un fichier PDF formaté (gère les caractères spéciaux)."""
+# FPDF gère mal l'UTF-8 par défaut. Il faut lui dire où trouver une police qui le supporte.
+# On utilise "DejaVu", une police libre qui gère la plupart des langues.
+# Si cette police est introuvable, Arial sera utilisé mais l'arabe/autres ne marcheront pas.
+FONT_DIRS = [".", "/usr/share/fonts/truetype/dejavu", "/usr/share/fonts/dejavu", "/Library/Fonts"]
+
+@lru_cache(maxsize=None)
+def find_font(filename):
+    """Cherche un fichier de police une seule fois (résultat mémorisé)."""
+    for directory in FONT_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _setup_fonts(pdf):
+    """Enregistre DejaVu (chemins résolus une seule fois) ; renvoie (famille, style du titre)."""
+    regular = find_font("DejaVuSans.ttf")
+    if not regular:
+        return "Arial", "B"
+    pdf.add_font("DejaVu", "", regular)
+    bold = find_font("DejaVuSans-Bold.ttf")
+    if bold:
+        pdf.add_font("DejaVu", "B", bold)
+    return "DejaVu", "B" if bold else ""
+
+def render_pdf(original_text, translated_text, source_lang, target_lang):
+    """Rend l'export PDF (gère les caractères spéciaux), un paragraphe par ligne du texte."""
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
-    
-    # FPDF gère mal l'UTF-8 par défaut. Il faut lui dire où trouver une police qui le supporte.
-    # On va utiliser "DejaVu", une police libre qui gère la plupart des langues.
-    # Vous devez avoir le fichier .ttf dans le même dossier ou spécifier le chemin.
-    # Si vous n'avez pas cette police, Arial sera utilisé mais l'arabe/autres ne marcheront pas.
-    try:
-        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-        font_family = 'DejaVu'
-    except RuntimeError:
-        print("Police DejaVu non trouvée, utilisation d'Arial (limité).")
-        font_family = 'Arial'
+    font_family, heading_style = _setup_fonts(pdf)
 
-    # Titre pour le texte original
-    pdf.set_font(font_family, 'B', 14)
-    pdf.cell(0, 10, f"Original ({source_lang.upper()})", ln=True)
-    
-    # Contenu original
-    pdf.set_font(font_family, '', 12)
-    pdf.multi_cell(0, 10, original_text)
-    
-    # Espace
-    pdf.ln(10)
-    
-    # Titre pour la traduction
-    pdf.set_font(font_family, 'B', 14)
-    pdf.cell(0, 10, f"Traduction ({target_lang.upper()})", ln=True)
-    
-    # Contenu traduit
-    pdf.set_font(font_family, '', 12)
-    pdf.multi_cell(0, 10, translated_text)
-    
-    pdf.output(filename)
+    sections = [(f"Original ({source_lang.upper()})", original_text)]
+    sections += [(f"Traduction ({lang.upper()})", text) for lang, text in _translations(translated_text, target_lang)]
+    for title, text in sections:
+        # Titre
+        pdf.set_font(font_family, heading_style, 14)
+        pdf.cell(0, 10, title, new_x="LMARGIN", new_y="NEXT")
+
+        # Contenu
+        pdf.set_font(font_family, '', 12)
+        for paragraph in text.split("\n"):
+            pdf.multi_cell(0, 10, paragraph, new_x="LMARGIN", new_y="NEXT")
+
+        # Espace
+        pdf.ln(10)
+
+    return bytes(pdf.output())
+
+RENDERERS = {"txt": render_txt, "docx": render_docx, "pdf": render_pdf}
+
+# --- Cache des exports (clé : hash du contenu + langues + format) ---
+
+EXPORT_CACHE_ITEMS = 32
+EXPORT_CACHE_BYTES = 64 * 2 ** 20
+_exports = OrderedDict()
+_exports_bytes = 0
+_exports_lock = threading.Lock()
+
+def export_key(original_text, translated_text, source_lang, target_lang, format):
+    h = hashlib.sha256()
+    parts = [original_text, source_lang, format]
+    for lang, text in _translations(translated_text, target_lang):
+        parts += [lang, text]
+    for part in parts:
+        h.update(part.encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+def render_translation(original_text, translated_text, source_lang, target_lang, format):
+    """
+    Renvoie l'export demandé (octets), construit une seule fois pour un même contenu.
+    Le cache est borné en nombre d'exports et en octets ; un export plus gros que
+    EXPORT_CACHE_BYTES n'est pas gardé.
+    """
+    global _exports_bytes
+    if format not in RENDERERS:
+        raise ValueError("Format de sauvegarde non supporté.")
+    key = export_key(original_text, translated_text, source_lang, target_lang, format)
+    with _exports_lock:
+        if key in _exports:
+            _exports.move_to_end(key)
+            return _exports[key]
+
+    with span(f"export_{format}"):
+        data = RENDERERS[format](original_text, translated_text, source_lang, target_lang)
+
+    with _exports_lock:
+        if key not in _exports and len(data) <= EXPORT_CACHE_BYTES:
+            _exports[key] = data
+            _exports_bytes += len(data)
+            while len(_exports) > EXPORT_CACHE_ITEMS or _exports_bytes > EXPORT_CACHE_BYTES:
+                _, evicted = _exports.popitem(last=False)
+                _exports_bytes -= len(evicted)
+    return data
+
+# --- Fonctions fichier (compatibilité) ---
+
+def _write(data, filename):
+    with open(filename, "wb") as f:
+        f.write(data)
     return filename
 
+def save_txt(original_text, translated_text, source_lang, target_lang, filename):
+    """Crée un fichier TXT formaté."""
+    return _write(render_translation(original_text, translated_text, source_lang, target_lang, "txt"), filename)
+
+def save_docx(original_text, translated_text, source_lang, target_lang, filename):
+    """Crée un fichier DOCX formaté."""
+    return _write(render_translation(original_text, translated_text, source_lang, target_lang, "docx"), filename)
+
+def save_pdf(original_text, translated_text, source_lang, target_lang, filename):
+    """Crée un fichier PDF formaté (gère les caractères spéciaux)."""
+    return _write(render_translation(original_text, translated_text, source_lang, target_lang, "pdf"), filename)
+
 # --- Fonction principale appelée par l'application ---
 
 def save_translation(original_text, translated_text, source_lang, target_lang, format, filename=None):
@@ -106,4 +203,3 @@ def save_translation(original_text, translated_text, source_lang, target_lang, f
         return save_pdf(**args)
     else:
         raise ValueError("Format de sauvegarde non supporté.")
-
@@ -1,32 +1,397 @@
-from modules.translator_module import translate_text, NLLB_LANGS, detect_language
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.translator_module import translate_text, translate_batch, split_sentences, NLLB_LANGS, detect_language
+from modules.metrics_module import timed
+from modules.ocr_module import ocr_pdf_page
+from modules.langid_module import fast_detect
 import pdfplumber
 from docx import Document
 
+# Extraction parallèle au-delà de ce nombre de pages, dans un pool de processus partagé
+# par tous les documents (créé au premier gros PDF, fermé à la sortie)
+PARALLEL_MIN_PAGES = 40
+PAGES_PER_TASK = 10
+EXTRACT_WORKERS = max(1, min(4, multiprocessing.cpu_count() - 1))
+# Taille des "pages" pour les formats sans pagination (lignes TXT / paragraphes DOCX)
+LINES_PER_BLOCK = 50
+# Pages scannées (sans couche texte) : rastérisation + OCR EasyOCR dans un pool de processus
+# partagé par tous les documents. Chaque processus charge son lecteur EasyOCR une seule fois
+# (registre des modèles du processus, budget NEUROTRANSLATE_MODEL_BUDGET_MB hérité) :
+# peu de processus, tâches en cours bornées.
+OCR_DPI = int(os.environ.get("NEUROTRANSLATE_OCR_DPI", "200"))
+OCR_WORKERS = 2  # 0 : OCR dans le processus courant
+
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
 def read_txt(file_path):
     with open(file_path,"r",encoding="utf-8") as f:
         return f.read()
 
-def read_pdf(file_path):
-    text = ""
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-    return text
+@timed("read_pdf")
+def read_pdf(file_path, ocr_lang=None):
+    return "\n".join(iter_pdf_pages(file_path, ocr_lang=ocr_lang)) + "\n"
 
+@timed("read_docx")
 def read_docx(file_path):
     doc = Document(file_path)
     return "\n".join([p.text for p in doc.paragraphs])
 
-def file_translate(file_path, file_type, target_lang="en"):
+# --- Extraction paresseuse (générateurs) ---
+
+def _blocks(lines, size=LINES_PER_BLOCK):
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield "\n".join(block)
+            block = []
+    if block:
+        yield "\n".join(block)
+
+def iter_txt_blocks(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from _blocks(line.rstrip("\n") for line in f)
+
+def iter_docx_blocks(file_path):
+    doc = Document(file_path)
+    yield from _blocks(p.text for p in doc.paragraphs)
+
+def _page_info(page):
+    """
+    Texte d'une page et mode d'extraction : "text" (couche texte), "ocr" (page scannée :
+    pas de texte mais des images, texte rempli plus tard) ou "empty".
+    """
+    start = time.perf_counter()
+    text = page.extract_text() or ""
+    mode = "text" if text.strip() else ("ocr" if page.images else "empty")
+    return {"index": page.page_number - 1, "text": text, "mode": mode, "seconds": time.perf_counter() - start}
+
+def _extract_pages(file_path, start, end):
+    """Extrait le texte des pages [start, end) (exécuté dans un processus séparé)."""
+    with pdfplumber.open(file_path) as pdf:
+        return [_page_info(pdf.pages[i]) for i in range(start, end)]
+
+def count_pdf_pages(file_path):
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+def iter_pdf_pages(file_path, workers=None, ocr_lang=None):
+    """Renvoie le texte de chaque page, dans l'ordre ("" pour une page vide)."""
+    for page in iter_pdf_page_info(file_path, workers, ocr_lang=ocr_lang):
+        yield page["text"]
+
+def iter_pdf_page_info(file_path, workers=None, ocr=True, dpi=None, ocr_lang=None):
+    """
+    Renvoie, dans l'ordre des pages, {"index", "text", "mode", "seconds"}.
+    Les pages scannées sont rastérisées (`dpi`, OCR_DPI par défaut) et passées à EasyOCR
+    dans un pool de OCR_WORKERS processus ; les pages texte qui les suivent attendent leur tour.
+    Lecteur EasyOCR : celui de `ocr_lang` (langue source du document) si elle est connue,
+    sinon celui de la langue des pages texte déjà lues, sinon celui de l'écriture détectée
+    sur la première page scannée (reconnue seule, avant les suivantes).
+    """
+    pages = _iter_text_layer(file_path, workers)
+    if not ocr:
+        yield from pages
+        return
+
+    dpi = dpi or OCR_DPI
+    if OCR_WORKERS == 0:
+        for page in pages:
+            if page["mode"] == "text" and ocr_lang is None:
+                ocr_lang = _text_language(page["text"])
+            elif page["mode"] == "ocr":
+                page["text"], page["seconds"], ocr_lang = ocr_pdf_page(file_path, page["index"], dpi, ocr_lang)
+            yield page
+        return
+
+    pending = deque()
+    try:
+        for page in pages:
+            if page["mode"] == "text" and ocr_lang is None:
+                ocr_lang = _text_language(page["text"])
+            elif page["mode"] == "ocr" and ocr_lang is None:
+                # Langue inconnue : cette page fixe le lecteur des suivantes
+                page["text"], page["seconds"], ocr_lang = _submit_ocr(file_path, page["index"], dpi, None).result()
+            elif page["mode"] == "ocr":
+                page["future"] = _submit_ocr(file_path, page["index"], dpi, ocr_lang)
+            pending.append(page)
+            # Sortie dans l'ordre ; au plus 2 pages par processus en cours d'OCR,
+            # et au plus 2 * PAGES_PER_TASK pages en attente derrière une page scannée
+            while pending and ("future" not in pending[0] or pending[0]["future"].done()
+                               or sum("future" in p for p in pending) >= 2 * OCR_WORKERS
+                               or len(pending) >= 2 * PAGES_PER_TASK):
+                yield _resolve(pending.popleft())
+        while pending:
+            yield _resolve(pending.popleft())
+    finally:
+        # Document abandonné : ses pages encore en attente sont retirées du pool partagé
+        for page in pending:
+            if "future" in page:
+                page["future"].cancel()
+
+def _extract_executor():
+    """Pool de processus d'extraction du module, créé au premier gros PDF et fermé à la sortie."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # "spawn" : pas de fork d'un processus qui a déjà des threads / modèles chargés
+            _extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _extract_pool
+
+def shutdown_extract_pool():
+    global _extract_pool
+    with _extract_pool_lock:
+        pool, _extract_pool = _extract_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+atexit.register(shutdown_extract_pool)
+
+def _submit_extract(*args):
+    try:
+        return _extract_executor().submit(_extract_pages, *args)
+    except BrokenProcessPool:
+        shutdown_extract_pool()
+        return _extract_executor().submit(_extract_pages, *args)
+
+def _ocr_executor():
+    """Pool de processus OCR du module, créé à la première page scannée et fermé à la sortie."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            # "spawn" : pas de fork d'un processus qui a déjà des threads / modèles chargés
+            _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _ocr_pool
+
+def shutdown_ocr_pool():
+    global _ocr_pool
+    with _ocr_pool_lock:
+        pool, _ocr_pool = _ocr_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+atexit.register(shutdown_ocr_pool)
+
+def _submit_ocr(*args):
+    try:
+        return _ocr_executor().submit(ocr_pdf_page, *args)
+    except BrokenProcessPool:
+        # Un processus OCR a été tué (ex. mémoire) : nouveau pool
+        shutdown_ocr_pool()
+        return _ocr_executor().submit(ocr_pdf_page, *args)
+
+def _resolve(page):
+    future = page.pop("future", None)
+    if future is not None:
+        page["text"], page["seconds"], _ = future.result()
+    return page
+
+def _text_language(text, min_letters=40):
+    """Langue d'une page texte (choix du lecteur OCR des pages scannées) ; None si la page est trop courte."""
+    if sum(c.isalpha() for c in text) < min_letters:
+        return None
+    return fast_detect(text)[0]
+
+def _iter_text_layer(file_path, workers=None):
+    """
+    Couche texte de chaque page ({"index", "text", "mode", "seconds"}).
+    Les gros PDF sont extraits par le pool partagé, avec au plus 2 × `workers`
+    tâches en cours pour ce document afin de limiter la mémoire.
+    """
+    n_pages = count_pdf_pages(file_path)
+    if n_pages < PARALLEL_MIN_PAGES:
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages:
+                yield _page_info(page)
+                page.flush_cache()
+        return
+
+    workers = workers or EXTRACT_WORKERS
+    ranges = deque((s, min(s + PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, PAGES_PER_TASK))
+    pending = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < 2 * workers:
+                pending.append(_submit_extract(file_path, *ranges.popleft()))
+            yield from pending.popleft().result()
+    finally:
+        # Document abandonné : ses plages encore en attente sont retirées du pool partagé
+        for future in pending:
+            future.cancel()
+
+def iter_file_blocks(file_path, file_type, ocr_lang=None):
+    """
+    Découpe un fichier en blocs (pages PDF, groupes de lignes/paragraphes) au fil de la lecture :
+    {"text", "mode", "seconds"} (mode "text", "ocr" ou "empty" ; seconds : extraction de la page PDF).
+    """
     if file_type=="txt":
-        text = read_txt(file_path)
+        return ({"text": block, "mode": "text", "seconds": None} for block in iter_txt_blocks(file_path))
     elif file_type=="pdf":
-        text = read_pdf(file_path)
+        return iter_pdf_page_info(file_path, ocr_lang=ocr_lang)
     elif file_type=="docx":
-        text = read_docx(file_path)
+        return ({"text": block, "mode": "text", "seconds": None} for block in iter_docx_blocks(file_path))
     else:
         raise ValueError("Format non supporté")
-    
-    detected_lang, _ = detect_language(text)
-    translated = translate_text(text, NLLB_LANGS[detected_lang], NLLB_LANGS[target_lang])
-    return {"original_text": text, "translated_text": translated}
+
+def _produce(blocks, out, stop):
+    """Thread d'extraction : remplit la file bornée, termine par None (ou l'exception)."""
+    try:
+        for block in blocks:
+            if stop.is_set():
+                return
+            out.put(block)
+        out.put(None)
+    except Exception as e:
+        out.put(e)
+
+# --- Traduction en flux ---
+
+@timed("document_translate")
+def stream_translate(file_path, file_type, target_lang="en", source_lang=None, queue_size=4):
+    """
+    Traduit un document bloc par bloc.
+    L'extraction tourne dans un thread et alimente une file bornée (`queue_size`) ;
+    chaque bloc traduit est renvoyé immédiatement :
+    {"index", "total", "original", "translated", "source_lang", "mode", "seconds"}.
+    La langue source est détectée sur le premier bloc non vide si elle n'est pas fournie.
+    Les pages scannées sont reconnues par OCR (lecteur de la langue source si elle est fournie,
+    sinon choisi d'après le document lui-même, jamais d'après la langue cible).
+    """
+    total = count_pdf_pages(file_path) if file_type == "pdf" else None
+    blocks = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(iter_file_blocks(file_path, file_type, source_lang), blocks, stop), daemon=True)
+    producer.start()
+
+    index = 0
+    try:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            if isinstance(block, Exception):
+                raise block
+            text, translated = block["text"], ""
+            if text.strip():
+                if source_lang is None:
+                    source_lang, _ = detect_language(text)
+                translated = translate_text(text, NLLB_LANGS[source_lang], NLLB_LANGS[target_lang])
+            yield {"index": index, "total": total, "original": text, "translated": translated, "source_lang": source_lang,
+                   "mode": block["mode"], "seconds": block["seconds"]}
+            index += 1
+    finally:
+        # Arrêt anticipé du consommateur : on libère le producteur
+        stop.set()
+        while not blocks.empty():
+            blocks.get_nowait()
+
+def file_translate(file_path, file_type, target_lang="en"):
+    originals, translations, detected_lang, pages = [], [], None, []
+    for part in stream_translate(file_path, file_type, target_lang):
+        originals.append(part["original"])
+        translations.append(part["translated"])
+        detected_lang = part["source_lang"]
+        if part["seconds"] is not None:
+            pages.append({"index": part["index"], "mode": part["mode"], "seconds": round(part["seconds"], 3)})
+    return {"original_text": "\n".join(originals), "translated_text": "\n".join(translations),
+            "source_lang": detected_lang, "pages": pages}
+
+# --- Traduction DOCX -> DOCX (mise en page conservée) ---
+
+def _iter_paragraphs(container):
+    """Paragraphes d'un conteneur Word, y compris ceux des tableaux (imbriqués)."""
+    yield from container.paragraphs
+    for table in container.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield from _iter_paragraphs(cell)
+
+def iter_docx_paragraphs(doc):
+    """Tous les paragraphes d'un document : corps, tableaux, en-têtes et pieds de page."""
+    yield from _iter_paragraphs(doc)
+    seen = []
+    for section in doc.sections:
+        for part in (section.header, section.footer,
+                     section.first_page_header, section.first_page_footer,
+                     section.even_page_header, section.even_page_footer):
+            # Les sections liées à la précédente partagent le même en-tête
+            if part.is_linked_to_previous or any(e is part._element for e in seen):
+                continue
+            seen.append(part._element)
+            yield from _iter_paragraphs(part)
+
+def _has_links_or_fields(paragraph):
+    """Liens hypertexte et champs (sommaire, numéros de page...) : texte hors des runs directs du paragraphe."""
+    return bool(paragraph._p.xpath("./w:hyperlink | .//w:fldSimple | .//w:fldChar"))
+
+def _set_paragraph_text(paragraph, text):
+    """
+    Remplace le texte en gardant la mise en forme du premier run non vide : la mise en forme
+    des runs suivants (gras, italique, couleur dans la phrase) est perdue.
+    """
+    runs = [r for r in paragraph.runs if r.text]
+    if not runs:
+        return
+    runs[0].text = text
+    for run in runs[1:]:
+        run.text = ""
+
+@timed("translate_docx")
+def translate_docx(file_path, output, target_lang="en", source_lang=None, batch_size=16):
+    """
+    Traduit un DOCX en DOCX en conservant la structure (tableaux, en-têtes, pieds de page,
+    styles de paragraphe). La mise en forme à l'intérieur d'un paragraphe se réduit à celle
+    de son premier run ; les paragraphes contenant des liens hypertexte ou des champs
+    sont laissés tels quels. Chaque phrase distincte n'est traduite qu'une fois,
+    puis les segments uniques sont traduits par lots.
+    `output` : chemin ou objet fichier (BytesIO...). Renvoie des statistiques.
+    """
+    doc = Document(file_path)
+    # Les cellules fusionnées renvoient plusieurs fois le même paragraphe : dédoublonnage par élément XML.
+    # Les deux dictionnaires gardent une référence à l'élément : sans elle, lxml peut libérer le proxy
+    # et réutiliser son id() pour un autre paragraphe.
+    unique_paragraphs, skipped = {}, {}
+    for paragraph in iter_docx_paragraphs(doc):
+        if not paragraph.text.strip():
+            continue
+        if _has_links_or_fields(paragraph):
+            skipped[id(paragraph._p)] = paragraph._p
+        else:
+            unique_paragraphs.setdefault(id(paragraph._p), paragraph)
+    paragraphs = list(unique_paragraphs.values())
+
+    # Découpage en phrases + déduplication
+    layout, unique = [], {}
+    for paragraph in paragraphs:
+        segments = split_sentences(paragraph.text)
+        layout.append(segments)
+        for segment in segments:
+            unique.setdefault(segment, None)
+
+    if source_lang is None and unique:
+        source_lang, _ = detect_language(" ".join(list(unique)[:20]))
+
+    segments = list(unique)
+    if segments:
+        translations = translate_batch(segments, NLLB_LANGS[source_lang], NLLB_LANGS[target_lang], batch_size=batch_size)
+        unique = dict(zip(segments, translations))
+
+    for paragraph, para_segments in zip(paragraphs, layout):
+        _set_paragraph_text(paragraph, " ".join(unique[s] for s in para_segments))
+
+    doc.save(output)
+    total = sum(len(segments) for segments in layout)
+    return {"paragraphs": len(paragraphs), "skipped_paragraphs": len(skipped), "segments": total,
+            "unique_segments": len(unique), "source_lang": source_lang}
@@ -0,0 +1,163 @@
+# modules/history_module.py
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from modules.metrics_module import timed
+
+HISTORY_DB = "history.db"
+LEGACY_JSON = "history.json"  # ancien format : une entrée JSON par ligne
+
+_db = None
+_fts = True
+_lock = threading.Lock()
+
+def _connect():
+    """Ouvre (une seule fois) la base SQLite de l'historique, en mode WAL."""
+    global _db, _fts
+    if _db is not None:
+        return _db
+
+    db = sqlite3.connect(HISTORY_DB, check_same_thread=False)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS history ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " original TEXT NOT NULL, translated TEXT NOT NULL,"
+        " source_lang TEXT, target_lang TEXT, timestamp TEXT NOT NULL)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_history_pair ON history(source_lang, target_lang, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)")
+    db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    # Index plein texte (FTS5) synchronisé par triggers ; repli sur LIKE si FTS5 est absent
+    try:
+        db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+            " original, translated, content='history', content_rowid='id')"
+        )
+        db.execute(
+            "CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN"
+            " INSERT INTO history_fts(rowid, original, translated) VALUES (new.id, new.original, new.translated);"
+            " END"
+        )
+        db.execute(
+            "CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN"
+            " INSERT INTO history_fts(history_fts, rowid, original, translated)"
+            " VALUES ('delete', old.id, old.original, old.translated);"
+            " END"
+        )
+    except sqlite3.OperationalError:
+        _fts = False
+    db.commit()
+
+    _db = db
+    migrate_json()
+    return _db
+
+def migrate_json(path=None):
+    """Importe l'ancien history.json (une seule fois) puis le renomme en .bak."""
+    path = path or LEGACY_JSON
+    db = _db
+    if not os.path.exists(path):
+        return 0
+    if db.execute("SELECT 1 FROM meta WHERE key='migrated_json'").fetchone():
+        return 0
+
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                d = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            rows.append((d.get("original", ""), d.get("translated", ""), d.get("source_lang"),
+                         d.get("target_lang"), d.get("timestamp", "")))
+
+    with db:
+        db.executemany(
+            "INSERT INTO history (original, translated, source_lang, target_lang, timestamp) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_json', ?)", (str(len(rows)),))
+    os.replace(path, path + ".bak")
+    return len(rows)
+
+@timed("history_write")
+def add_entry(original, translated, source_lang, target_lang, timestamp=None):
+    """Ajoute une traduction à l'historique (une seule insertion, pas de réécriture)."""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M")
+    with _lock:
+        db = _connect()
+        with db:
+            cur = db.execute(
+                "INSERT INTO history (original, translated, source_lang, target_lang, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (original, translated, source_lang, target_lang, timestamp)
+            )
+    return cur.lastrowid
+
+def _where(source_lang=None, target_lang=None, date_from=None, date_to=None, query=None):
+    clauses, params = [], []
+    if source_lang:
+        clauses.append("h.source_lang = ?")
+        params.append(source_lang)
+    if target_lang:
+        clauses.append("h.target_lang = ?")
+        params.append(target_lang)
+    if date_from:
+        clauses.append("h.timestamp >= ?")
+        params.append(str(date_from))
+    if date_to:
+        # date_to inclusive : tout ce qui commence par cette date
+        clauses.append("h.timestamp < ?")
+        params.append(str(date_to) + "\uffff")
+    if query and query.strip():
+        if _fts:
+            terms = " ".join('"%s"*' % t.replace('"', '""') for t in query.split())
+            clauses.append("h.id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+            params.append(terms)
+        else:
+            for t in query.split():
+                clauses.append("(h.original LIKE ? OR h.translated LIKE ?)")
+                params += [f"%{t}%", f"%{t}%"]
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def get_entries(page=0, page_size=20, **filters):
+    """
+    Renvoie une page de l'historique, de la plus récente à la plus ancienne.
+    Filtres : source_lang, target_lang, date_from / date_to ("YYYY-MM-DD"), query (plein texte).
+    """
+    where, params = _where(**filters)
+    with _lock:
+        rows = _connect().execute(
+            f"SELECT h.* FROM history h{where} ORDER BY h.id DESC LIMIT ? OFFSET ?",
+            params + [page_size, page * page_size]
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+def iter_entries(chunk_size=500):
+    """Parcourt tout l'historique, de la plus ancienne à la plus récente entrée (par blocs)."""
+    last_id = 0
+    while True:
+        with _lock:
+            rows = _connect().execute(
+                "SELECT * FROM history WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size)
+            ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row)
+        last_id = rows[-1]["id"]
+
+def count_entries(**filters):
+    where, params = _where(**filters)
+    with _lock:
+        return _connect().execute(f"SELECT COUNT(*) FROM history h{where}", params).fetchone()[0]
@@ -0,0 +1,84 @@
+# modules/langid_module.py
+# Identification rapide de la langue (écriture + n-grammes de caractères),
+# sans modèle neuronal. Limitée aux langues de NLLB_LANGS.
+
+import re
+from collections import Counter
+
+# Mots outils très fréquents
+STOPWORDS = {
+    "fr": "le la les de des du un une et est en que qui dans pour pas sur au aux ce cette il elle nous vous "
+          "ils sont avec plus par ne se sa son ses mais ou où être avoir fait comme très tout",
+    "en": "the and is are of to in that it for on with as was were be by this have has not you we they "
+          "at from or an but his her their will would can which there what about",
+    "es": "el la los las de del y en que es un una por con para no se su sus al lo como más pero muy "
+          "está son hay este esta yo usted nosotros también porque cuando",
+    "de": "der die das und ist nicht ein eine zu den dem des mit von auf für sich im ich sie es wir "
+          "auch als wird sind war bei aus nach noch wie aber oder kann",
+}
+STOPWORDS = {lang: set(words.split()) for lang, words in STOPWORDS.items()}
+
+# Trigrammes de caractères caractéristiques (espaces inclus = début / fin de mot)
+TRIGRAMS = {
+    "fr": [" de", "es ", "ent", " le", "le ", "de ", "ion", "les", " la", "la ", "re ", "tio", " qu", "que",
+           "ait", " d'", "eme", "ans", "our", " pa", "ons", "ais", "nt "],
+    "en": [" th", "the", "he ", "ing", "ng ", " an", "and", "nd ", "ed ", " of", "of ", " to", "to ", "ion",
+           "er ", "is ", " in", "at ", "hat", "tha", "ere", "ly ", "'s "],
+    "es": [" de", "de ", " la", "os ", "la ", "el ", "que", " qu", "ue ", " en", "es ", "as ", " el", "ión",
+           "ado", "ent", " co", "aci", "ien", "dad", "ara", " pa", " lo"],
+    "de": ["en ", "er ", "ch ", "der", "ein", " di", "ie ", "sch", "die", "den", "ich", "che", " de", "cht",
+           " ei", "und", " un", "nd ", "ung", "gen", "ine", "ten", "ver"],
+}
+TRIGRAMS = {lang: set(grams) for lang, grams in TRIGRAMS.items()}
+
+# Caractères propres à une langue
+SPECIAL_CHARS = {
+    "fr": "éèêëàâçîïôœùû",
+    "es": "ñáíóú¿¡",
+    "de": "äöüß",
+}
+
+ARABIC_SCRIPT = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+LETTERS = re.compile(r"[^\W\d_]", re.UNICODE)
+WORDS = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?", re.UNICODE)
+
+def fast_detect(text, max_chars=1000):
+    """
+    Détection par règles : renvoie (langue, confiance entre 0 et 1).
+    La confiance est faible quand le texte est court ou ambigu ; l'appelant
+    peut alors se rabattre sur le modèle xlm-roberta.
+    """
+    text = text[:max_chars]
+    letters = LETTERS.findall(text)
+    if not letters:
+        return "en", 0.0
+
+    # 1. Écriture arabe
+    arabic_ratio = len(ARABIC_SCRIPT.findall(text)) / len(letters)
+    if arabic_ratio > 0.5:
+        return "ar", round(min(1.0, arabic_ratio), 4)
+
+    # 2. Langues latines : mots outils + trigrammes + caractères spéciaux
+    lowered = text.lower()
+    words = WORDS.findall(lowered)
+    padded = " " + " ".join(words) + " "
+    trigrams = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    scores = {}
+    for lang in STOPWORDS:
+        score = 2.0 * sum(1 for w in words if w in STOPWORDS[lang])
+        score += sum(count for gram, count in trigrams.items() if gram in TRIGRAMS[lang]) / 3.0
+        score += 3.0 * sum(lowered.count(c) for c in SPECIAL_CHARS.get(lang, ""))
+        scores[lang] = score
+
+    total = sum(scores.values())
+    if total == 0:
+        return "en", 0.0
+    best = max(scores, key=scores.get)
+    ranked = sorted(scores.values(), reverse=True)
+    # Part du meilleur score, pénalisée si le texte apporte peu d'indices
+    share = ranked[0] / total
+    margin = (ranked[0] - ranked[1]) / ranked[0]
+    evidence = min(1.0, len(words) / 8)
+    confidence = (0.5 * share + 0.5 * margin) * evidence
+    return best, round(confidence, 4)
@@ -0,0 +1,404 @@
+# modules/memory_module.py
+# Mémoire de traduction : paires (segment source, segment traduit) des traductions passées.
+# Un segment qui ne diffère d'un segment mémorisé que par ses nombres, noms propres, sa ponctuation
+# interne ou sa casse (même ponctuation finale) est servi sans appel à NLLB. Les segments seulement
+# proches (similarité de n-grammes de caractères) sont affichés comme suggestions à côté de la
+# traduction du modèle : un mot différent ("like" / "dislike", "is" / "is not") peut en changer le sens.
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from modules.cache_module import DB_TIMEOUT, normalize_text
+
+TM_DB = "translation_memory.db"
+# Similarité minimale (coefficient de Dice sur les trigrammes, de 0 à 1) pour proposer une suggestion
+TM_THRESHOLD = float(os.environ.get("NEUROTRANSLATE_TM_THRESHOLD", "0.9"))
+# Segments conservés par paire de langues (les plus anciens sont supprimés au-delà) ; borne aussi
+# le chargement de l'index au premier accès à une paire (de l'ordre d'une seconde pour 20 000 segments)
+TM_MAX_ENTRIES = int(os.environ.get("NEUROTRANSLATE_TM_MAX_ENTRIES", "20000"))
+# En dessous de cette longueur, aucune suggestion n'est proposée
+MIN_FUZZY_CHARS = 12
+NGRAM = 3
+# Filtrage des candidats : nombre minimal de trigrammes rares partagés avec la requête
+MIN_PREFIX_HITS = 8
+
+# Éléments remplacés par des marqueurs (caractères à usage privé) avant comparaison,
+# puis recopiés dans la traduction
+NUMBER, ENTITY = "\ue000", "\ue001"
+PLACEHOLDER = re.compile(
+    r"(?P<entity>https?://\S+|[\w.+-]+@[\w-]+\.[\w.]+)"
+    r"|(?P<number>\d+(?:[.,:/]\d+)*%?)"
+    r"|(?P<word>[^\W\d_][\w'’-]*)"
+)
+SENTENCE_END = re.compile(r"[.!?:;؟]")
+# Trou de la traduction mémorisée : \ue002<indice>\ue003
+SLOT = re.compile("\ue002(\\d+)\ue003")
+# Mots et marqueurs d'une clé (la ponctuation et les espaces sont ignorés)
+TOKEN = re.compile("[^\\W_]+|[\ue000\ue001]")
+# Ponctuation finale (une question ne doit pas recevoir la traduction d'une affirmation)
+ENDING = re.compile(r"[.!?…:;؟]*$")
+
+
+def mask(text):
+    """
+    Remplace nombres, URL / e-mails et noms propres (mot capitalisé hors début de phrase,
+    ou sigle) par des marqueurs. Renvoie (texte masqué, [(type, valeur)]).
+    """
+    parts, values, last, sentence_start = [], [], 0, True
+    for m in PLACEHOLDER.finditer(text):
+        if SENTENCE_END.search(text[last:m.start()]):
+            sentence_start = True
+        word = m.group("word")
+        if m.group("entity"):
+            kind = ENTITY
+        elif m.group("number"):
+            kind = NUMBER
+        elif (word[0].isupper() and not sentence_start) or (len(word) > 1 and word.isupper()):
+            kind = ENTITY
+        else:
+            kind = None
+        sentence_start = False
+        if kind:
+            parts += [text[last:m.start()], kind]
+            values.append((kind, m.group()))
+        else:
+            parts.append(text[last:m.end()])
+        last = m.end()
+    parts.append(text[last:])
+    return "".join(parts), values
+
+
+def match_key(masked):
+    """Forme comparée : texte masqué normalisé, en minuscules."""
+    return normalize_text(masked).lower()
+
+
+def tokens(key):
+    """Suite des mots et marqueurs d'une clé (voir `match_key`), sans la ponctuation."""
+    return tuple(TOKEN.findall(key))
+
+
+def ending(key):
+    """Ponctuation finale d'une clé ("" s'il n'y en a pas)."""
+    return ENDING.search(key.rstrip()).group()
+
+
+def grams(key):
+    """Ensemble des trigrammes de caractères d'une clé (voir `match_key`)."""
+    padded = f" {key} "
+    return frozenset(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+
+
+def template(target, values):
+    """
+    Remplace dans la traduction les valeurs masquées côté source qui s'y retrouvent telles quelles.
+    Renvoie (modèle de traduction, indices remplaçables).
+    """
+    slots = set()
+    # Les plus longues d'abord : "10" ne doit pas être remplacé à l'intérieur de "2010"
+    for i in sorted(range(len(values)), key=lambda i: -len(values[i][1])):
+        pattern = re.compile(r"(?<![\w\ue002])" + re.escape(values[i][1]) + r"(?![\w\ue003])")
+        target, n = pattern.subn(f"\ue002{i}\ue003", target)
+        if n:
+            slots.add(i)
+    return target, frozenset(slots)
+
+
+class _Entry:
+    __slots__ = ("key", "tokens", "ending", "grams", "template", "slots", "values")
+
+    def __init__(self, source, target):
+        masked, self.values = mask(source)
+        self.key = match_key(masked)
+        self.tokens = tokens(self.key)
+        self.ending = ending(self.key)
+        self.grams = grams(self.key)
+        self.template, self.slots = template(target, self.values)
+
+    def fill(self, values):
+        """Traduction pour une requête de mêmes marqueurs ; None si un élément non remplaçable diffère."""
+        if [kind for kind, _ in values] != [kind for kind, _ in self.values]:
+            return None
+        for i, (value, stored) in enumerate(zip(values, self.values)):
+            if i not in self.slots and value[1] != stored[1]:
+                return None
+        return SLOT.sub(lambda m: values[int(m.group(1))][1], self.template)
+
+
+class _Index:
+    """Index inversé trigramme -> entrées, pour une paire de langues."""
+
+    def __init__(self):
+        self.entries = []
+        self.exact = {}     # texte masqué normalisé -> indice de l'entrée
+        self.words = {}     # suite de mots et marqueurs -> indice de l'entrée la plus récente
+        self.postings = {}  # trigramme -> [indices]
+
+    def add(self, entry):
+        if entry.key in self.exact:
+            # Même segment (après masquage) : la traduction la plus récente remplace l'ancienne
+            i = self.exact[entry.key]
+            old = self.entries[i]
+            old.template, old.slots, old.values = entry.template, entry.slots, entry.values
+            self.words[entry.tokens] = i
+            return
+        i = len(self.entries)
+        self.entries.append(entry)
+        self.exact[entry.key] = i
+        self.words[entry.tokens] = i
+        for gram in entry.grams:
+            self.postings.setdefault(gram, []).append(i)
+
+    def trimmed(self, keep):
+        """Nouvel index limité aux `keep` entrées les plus récentes."""
+        index = _Index()
+        for entry in self.entries[-keep:]:
+            index.add(entry)
+        return index
+
+    def search(self, masked, values):
+        """
+        Entrée de mêmes mots et de même ponctuation finale (seuls nombres, noms propres, ponctuation
+        interne ou casse diffèrent) : (traduction, score, type) ou None. Le score vaut 1.0 pour un
+        segment identique après masquage ; type : "exact" (mêmes valeurs), "substituted" (nombres
+        ou noms remplacés) ou "variant" (ponctuation interne / espaces différents).
+        """
+        key = match_key(masked)
+        i = self.exact.get(key)
+        if i is None:
+            i = self.words.get(tokens(key))
+            if i is None or self.entries[i].ending != ending(key):
+                return None
+        entry = self.entries[i]
+        translation = entry.fill(values)
+        if translation is None:
+            return None
+        if [value for _, value in values] != [value for _, value in entry.values]:
+            kind = "substituted"
+        else:
+            kind = "exact" if key == entry.key else "variant"
+        if key == entry.key:
+            return translation, 1.0, kind
+        query = grams(key)
+        return translation, round(2 * len(query & entry.grams) / (len(query) + len(entry.grams)), 4), kind
+
+    def suggest(self, masked, values, threshold):
+        """Entrée la plus proche de similarité >= threshold (mots différents possibles) : (traduction, score) ou None."""
+        key = match_key(masked)
+        if len(key) < MIN_FUZZY_CHARS:
+            return None
+
+        query = grams(key)
+        a = len(query)
+        # Dice >= t impose au moins k trigrammes communs, tous pris parmi les r trigrammes
+        # de la requête présents dans l'index : un candidat en manque au plus r - k. Parmi les
+        # p plus rares, il en partage donc au moins p - (r - k) (filtrage par préfixe).
+        k = math.ceil(threshold * a / (2 - threshold))
+        rare = sorted((g for g in query if g in self.postings), key=lambda g: len(self.postings[g]))
+        r = len(rare)
+        if r < k:
+            return None
+        p = min(r, r - k + MIN_PREFIX_HITS)
+        hits = Counter()
+        for gram in rare[:p]:
+            hits.update(self.postings[gram])
+        required = p - (r - k)
+
+        lo, hi = threshold * a / (2 - threshold), (2 - threshold) * a / threshold
+        scored = []
+        for i, count in hits.items():
+            if count < required:
+                continue
+            b = len(self.entries[i].grams)
+            if lo <= b <= hi:
+                score = 2 * len(query & self.entries[i].grams) / (a + b)
+                if score >= threshold:
+                    scored.append((score, i))
+        for score, i in sorted(scored, reverse=True):
+            translation = self.entries[i].fill(values)
+            if translation is not None:
+                return translation, round(score, 4)
+        return None
+
+
+class TranslationMemory:
+    """
+    Mémoire de traduction persistante (SQLite) avec index en mémoire par paire de langues,
+    construit au premier accès à cette paire, bornés à `max_entries` segments par paire.
+    Un segment de mêmes mots qu'un segment mémorisé est servi sans appel au modèle ;
+    nombres et noms propres de la requête sont recopiés dans la traduction mémorisée.
+    Les segments de similarité >= `threshold` ne sont que des suggestions (`suggest_many`).
+    """
+
+    def __init__(self, db_path=TM_DB, threshold=TM_THRESHOLD, max_entries=TM_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.indexes = {}
+        self.writes = {}  # paire de langues -> segments écrits depuis la dernière vérification de taille
+        self.counts = {"lookups": 0, "exact": 0, "substituted": 0, "variant": 0, "suggestions": 0, "seconds": 0.0}
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(db_path, timeout=DB_TIMEOUT, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " src_lang TEXT NOT NULL, tgt_lang TEXT NOT NULL,"
+            " source TEXT NOT NULL, target TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (src_lang, tgt_lang, source))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_memory_created ON memory(src_lang, tgt_lang, created)")
+        self.db.commit()
+
+    def _index(self, src_lang, tgt_lang):
+        index = self.indexes.get((src_lang, tgt_lang))
+        if index is None:
+            index = self.indexes[src_lang, tgt_lang] = _Index()
+            # Les `max_entries` plus récents seulement : chargement borné au premier accès
+            rows = self.db.execute(
+                "SELECT source, target FROM memory WHERE src_lang=? AND tgt_lang=? ORDER BY created DESC LIMIT ?",
+                (src_lang, tgt_lang, self.max_entries)
+            ).fetchall()
+            for source, target in reversed(rows):
+                index.add(_Entry(source, target))
+        return index
+
+    def _prune(self, src_lang, tgt_lang, written):
+        """Au-delà de `max_entries` (+10 %), ne garde que les segments les plus récents (index et base)."""
+        index = self.indexes[src_lang, tgt_lang]
+        if len(index.entries) > self.max_entries * 1.1:
+            self.indexes[src_lang, tgt_lang] = index.trimmed(self.max_entries)
+        # Taille de la base vérifiée tous les max_entries / 10 segments écrits
+        self.writes[src_lang, tgt_lang] = self.writes.get((src_lang, tgt_lang), 0) + written
+        if self.writes[src_lang, tgt_lang] < self.max_entries / 10:
+            return
+        self.writes[src_lang, tgt_lang] = 0
+        count = self.db.execute("SELECT COUNT(*) FROM memory WHERE src_lang=? AND tgt_lang=?",
+                                (src_lang, tgt_lang)).fetchone()[0]
+        if count <= self.max_entries * 1.1:
+            return
+        self.db.execute(
+            "DELETE FROM memory WHERE src_lang=? AND tgt_lang=? AND rowid NOT IN ("
+            " SELECT rowid FROM memory WHERE src_lang=? AND tgt_lang=? ORDER BY created DESC LIMIT ?)",
+            (src_lang, tgt_lang, src_lang, tgt_lang, self.max_entries)
+        )
+
+    # --- API ---
+
+    def add_many(self, pairs, src_lang, tgt_lang):
+        """Mémorise des paires (segment source, traduction)."""
+        pairs = [(normalize_text(s), t) for s, t in pairs if s.strip() and t.strip()]
+        if not pairs:
+            return
+        now = time.time()
+        with self.lock:
+            index = self._index(src_lang, tgt_lang)
+            for source, target in pairs:
+                index.add(_Entry(source, target))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO memory (src_lang, tgt_lang, source, target, created) VALUES (?, ?, ?, ?, ?)",
+                [(src_lang, tgt_lang, source, target, now) for source, target in pairs]
+            )
+            self._prune(src_lang, tgt_lang, len(pairs))
+            self.db.commit()
+
+    def lookup(self, text, src_lang, tgt_lang):
+        return self.lookup_many([text], src_lang, tgt_lang).get(0)
+
+    def lookup_many(self, texts, src_lang, tgt_lang):
+        """Renvoie {position: (traduction, score)} pour les segments trouvés dans la mémoire."""
+        found = {}
+        start = time.perf_counter()
+        with self.lock:
+            index = self._index(src_lang, tgt_lang)
+            if index.entries:
+                for i, text in enumerate(texts):
+                    masked, values = mask(normalize_text(text))
+                    match = index.search(masked, values)
+                    if match:
+                        translation, score, kind = match
+                        found[i] = translation, score
+                        self.counts[kind] += 1
+            self.counts["lookups"] += len(texts)
+            self.counts["seconds"] += time.perf_counter() - start
+        return found
+
+    def suggest_many(self, texts, src_lang, tgt_lang):
+        """
+        Renvoie {position: (traduction, score)} : traduction mémorisée la plus proche de chaque
+        segment non servi par la mémoire (similarité >= threshold). À relire : elle n'est
+        jamais servie automatiquement.
+        """
+        found = {}
+        with self.lock:
+            index = self._index(src_lang, tgt_lang)
+            if index.entries:
+                for i, text in enumerate(texts):
+                    masked, values = mask(normalize_text(text))
+                    if index.search(masked, values):
+                        continue
+                    match = index.suggest(masked, values, self.threshold)
+                    if match:
+                        found[i] = match
+            self.counts["suggestions"] += len(found)
+        return found
+
+    def import_history(self, path=None):
+        """
+        Alimente la mémoire avec l'historique des traductions (base SQLite de l'historique,
+        ou un fichier au format de l'ancien history.json si `path` est donné).
+        Les textes sont réalignés ligne à ligne puis phrase à phrase ; une ligne dont les
+        nombres de phrases diffèrent est ignorée. Renvoie le nombre de paires importées.
+        """
+        from modules.translator_module import NLLB_LANGS, split_sentences
+        from modules.history_module import iter_entries
+
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = iter_entries()
+
+        pairs = {}
+        for entry in entries:
+            src, tgt = NLLB_LANGS.get(entry.get("source_lang")), NLLB_LANGS.get(entry.get("target_lang"))
+            original, translated = entry.get("original") or "", entry.get("translated") or ""
+            lines, translated_lines = original.split("\n"), translated.split("\n")
+            if not src or not tgt or len(lines) != len(translated_lines):
+                continue
+            for line, translated_line in zip(lines, translated_lines):
+                sources, targets = split_sentences(line), split_sentences(translated_line)
+                if len(sources) == len(targets):
+                    pairs.setdefault((src, tgt), []).extend(zip(sources, targets))
+
+        for (src, tgt), items in pairs.items():
+            self.add_many(items, src, tgt)
+        return sum(len(items) for items in pairs.values())
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+            self.db.execute("DELETE FROM memory")
+            self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+            counts = dict(self.counts)
+        lookups = counts["lookups"]
+        return {
+            "entries": entries,
+            "lookups": lookups,
+            "exact_matches": counts["exact"],
+            "substituted_matches": counts["substituted"],
+            "variant_matches": counts["variant"],
+            "suggestions": counts["suggestions"],
+            "match_rate": round((counts["exact"] + counts["substituted"] + counts["variant"]) / lookups, 4)
+            if lookups else 0.0,
+            "avg_lookup_ms": round(1000 * counts["seconds"] / lookups, 3) if lookups else 0.0,
+        }
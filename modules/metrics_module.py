@@ -0,0 +1,166 @@
+# modules/metrics_module.py
+# Instrumentation : temps réel (wall), temps CPU, tokens et temps de chargement des modèles
+# pour chaque étape, agrégés en mémoire (histogrammes) et exportables (JSON / Prometheus).
+
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Bornes des histogrammes (secondes)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+RECENT_SAMPLES = 200
+
+_stages = {}
+_lock = threading.Lock()
+
+class _Stage:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.tokens = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.last = None
+
+    def add(self, wall, cpu, tokens, error):
+        self.count += 1
+        self.errors += int(error)
+        self.wall += wall
+        self.cpu += cpu
+        self.tokens += tokens
+        self.recent.append(wall)
+        self.last = wall
+        for i, bound in enumerate(BUCKETS):
+            if wall <= bound:
+                self.buckets[i] += 1
+                break
+
+def record(stage, wall, cpu=0.0, tokens=0, error=False):
+    """Ajoute une mesure à l'étape `stage`."""
+    with _lock:
+        _stages.setdefault(stage, _Stage()).add(wall, cpu, tokens, error)
+
+def count_tokens(stage, tokens):
+    """Ajoute des tokens à une étape sans compter d'appel (ex. générateurs chronométrés par `timed`)."""
+    with _lock:
+        _stages.setdefault(stage, _Stage()).tokens += tokens
+
+class Span:
+    """Mesure en cours ; le code instrumenté peut renseigner `tokens`."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.tokens = 0
+
+@contextmanager
+def span(stage):
+    """
+    Chronomètre un bloc : temps réel et temps CPU du processus
+    (inclut les threads de calcul de PyTorch).
+    """
+    current = Span(stage)
+    wall, cpu = time.perf_counter(), time.process_time()
+    error = False
+    try:
+        yield current
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(stage, time.perf_counter() - wall, time.process_time() - cpu, current.tokens, error)
+
+def timed(stage):
+    """Décorateur : chaque appel est mesuré comme un span. Pour un générateur,
+    seul le temps passé dans le générateur est compté (pas celui de l'appelant)."""
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                wall = cpu = 0.0
+                error = False
+                iterator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        w, c = time.perf_counter(), time.process_time()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        finally:
+                            wall += time.perf_counter() - w
+                            cpu += time.process_time() - c
+                        yield item
+                except BaseException as e:
+                    error = not isinstance(e, GeneratorExit)
+                    raise
+                finally:
+                    iterator.close()
+                    record(stage, wall, cpu, 0, error)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+def snapshot():
+    """État agrégé de toutes les étapes (dictionnaire sérialisable en JSON)."""
+    with _lock:
+        stages = {name: s for name, s in _stages.items()}
+        result = {}
+        for name, s in stages.items():
+            result[name] = {
+                "count": s.count,
+                "errors": s.errors,
+                "wall_seconds": round(s.wall, 4),
+                "cpu_seconds": round(s.cpu, 4),
+                "tokens": s.tokens,
+                "mean_ms": round(1000 * s.wall / s.count, 2) if s.count else None,
+                "p50_ms": round(1000 * _quantile(s.recent, 0.5), 2) if s.recent else None,
+                "p95_ms": round(1000 * _quantile(s.recent, 0.95), 2) if s.recent else None,
+                "last_ms": round(1000 * s.last, 2) if s.last is not None else None,
+                "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(BUCKETS, s.buckets)},
+            }
+    return result
+
+def snapshot_json():
+    return json.dumps({"timestamp": time.time(), "stages": snapshot()}, indent=2, ensure_ascii=False)
+
+def prometheus_text(prefix="neurotranslate"):
+    """Export au format texte Prometheus (histogramme par étape + compteurs CPU / tokens / erreurs)."""
+    lines = [
+        f"# HELP {prefix}_stage_seconds Durée (temps réel) de chaque étape.",
+        f"# TYPE {prefix}_stage_seconds histogram",
+    ]
+    stages = snapshot()
+    for name, s in stages.items():
+        cumulative = 0
+        for bound, count in s["buckets"].items():
+            cumulative += count
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {s["wall_seconds"]}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+    for metric, key, help_text in (("cpu_seconds_total", "cpu_seconds", "Temps CPU du processus par étape."),
+                                   ("tokens_total", "tokens", "Tokens traités par étape."),
+                                   ("errors_total", "errors", "Appels en erreur par étape.")):
+        lines.append(f"# HELP {prefix}_stage_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_stage_{metric} counter")
+        for name, s in stages.items():
+            lines.append(f'{prefix}_stage_{metric}{{stage="{name}"}} {s[key]}')
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _stages.clear()
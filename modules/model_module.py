@@ -0,0 +1,294 @@
+# modules/model_module.py
+
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from modules.metrics_module import span
+
+# Précision d'inférence CPU : "fp32", "int8" (quantification dynamique des couches Linear)
+# ou "bf16" (si le processeur le supporte)
+PRECISIONS = ("fp32", "int8", "bf16")
+PRECISION = os.environ.get("NEUROTRANSLATE_PRECISION", "fp32")
+
+# Budget mémoire des modèles chargés (Mo, 0 = illimité). Au-delà, les modèles les moins
+# récemment utilisés sont déchargés ; ils seront rechargés à leur prochaine utilisation.
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("NEUROTRANSLATE_MODEL_BUDGET_MB", "0"))
+
+# Registre des modèles : chaque fonctionnalité déclare un chargeur,
+# le modèle n'est construit qu'à sa première utilisation.
+_loaders = {}
+_models = {}
+_status = {}
+_locks = {}
+_registry_lock = threading.Lock()
+# Modèles chargés, du moins au plus récemment utilisé -> taille estimée (octets)
+_resident = OrderedDict()
+_resident_lock = threading.Lock()
+_totals = {"loads": 0, "evictions": 0}
+
+def register_model(name, loader, description=""):
+    """Déclare un modèle chargeable à la demande (`loader()` renvoie l'objet à mettre en cache)."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        _status.setdefault(name, {"description": description, "state": "non chargé", "load_time": None, "error": None,
+                                  "source": None, "size_mb": None, "loads": 0, "evictions": 0})
+
+def get_model(name):
+    """
+    Renvoie le modèle `name`, en le chargeant s'il ne l'est pas encore (un seul chargement par processus).
+    Avec un budget mémoire, le chargement peut décharger d'autres modèles (les moins récemment utilisés).
+    """
+    model = _models.get(name)
+    if model is not None:
+        _mark_used(name)
+        return model
+    if name not in _loaders:
+        raise KeyError(f"Modèle inconnu : {name}")
+
+    with _locks[name]:
+        model = _models.get(name)
+        if model is None:
+            # Taille connue (modèle déjà chargé puis déchargé) : on libère la place avant le chargement
+            size_mb = _status[name]["size_mb"]
+            _evict(int((size_mb or 0) * 2 ** 20), keep=name)
+            _status[name].update(state="chargement", error=None)
+            start = time.perf_counter()
+            rss_before = rss_bytes()
+            loader, source = _loader(name)
+            try:
+                with span(f"model_load_{name}"):
+                    model = loader()
+            except Exception as e:
+                _status[name].update(state="erreur", error=str(e))
+                raise
+            size = model_size_bytes(model) or max(rss_bytes() - rss_before, 0)
+            with _resident_lock:
+                _models[name] = model
+                _resident[name] = size
+                _totals["loads"] += 1
+            _status[name].update(state="chargé", load_time=round(time.perf_counter() - start, 2), source=source,
+                                 size_mb=round(size / 2 ** 20, 1), loads=_status[name]["loads"] + 1)
+            _evict(0, keep=name)
+        else:
+            _mark_used(name)
+    return model
+
+def _loader(name):
+    """Chargeur à utiliser : l'instantané du modèle (poids partagés par mmap) s'il existe, sinon celui déclaré."""
+    from modules.snapshot_module import has_snapshot, load_snapshot
+    if has_snapshot(name):
+        return (lambda: load_snapshot(name)), "instantané"
+    return _loaders[name], "origine"
+
+def is_loaded(name):
+    return name in _models
+
+def model_status():
+    """État, temps de chargement (secondes), taille estimée (Mo) et compteurs de chaque modèle déclaré."""
+    return {name: dict(info) for name, info in _status.items()}
+
+# --- Budget mémoire (éviction LRU) ---
+
+def _mark_used(name):
+    with _resident_lock:
+        if name in _resident:
+            _resident.move_to_end(name)
+
+def _evict(needed, keep=None):
+    """Décharge les modèles les moins récemment utilisés (sauf `keep`) jusqu'à laisser `needed` octets libres dans le budget."""
+    if MODEL_MEMORY_BUDGET_MB <= 0:
+        return []
+    limit = MODEL_MEMORY_BUDGET_MB * 2 ** 20
+    victims = []
+    with _resident_lock:
+        used = sum(_resident.values())
+        for name in list(_resident):
+            if used + needed <= limit:
+                break
+            if name != keep:
+                used -= _resident[name]
+                victims.append(name)
+    for name in victims:
+        unload_model(name, evicted=True)
+    return victims
+
+def unload_model(name, evicted=False):
+    """
+    Décharge un modèle (il sera rechargé à sa prochaine utilisation). La mémoire n'est rendue
+    qu'une fois les appels en cours qui l'utilisent terminés. Renvoie False s'il n'était pas chargé.
+    """
+    with _resident_lock:
+        model = _models.pop(name, None)
+        _resident.pop(name, None)
+        if model is None:
+            return False
+        if evicted:
+            _totals["evictions"] += 1
+    _status[name].update(state="déchargé", evictions=_status[name]["evictions"] + int(evicted))
+    del model
+    _release_memory()
+    return True
+
+def memory_usage():
+    """Mémoire estimée des modèles chargés (Mo), budget et compteurs de chargements / évictions."""
+    with _resident_lock:
+        resident = dict(_resident)
+        totals = dict(_totals)
+    return {
+        "budget_mb": MODEL_MEMORY_BUDGET_MB or None,
+        "used_mb": round(sum(resident.values()) / 2 ** 20, 1),
+        "models": {name: round(size / 2 ** 20, 1) for name, size in resident.items()},  # du moins au plus récent
+        **totals,
+    }
+
+def model_metrics_text(prefix="neurotranslate"):
+    """Mémoire et compteurs des modèles au format texte Prometheus (complète metrics_module.prometheus_text)."""
+    usage = memory_usage()
+    lines = [
+        f"# HELP {prefix}_model_memory_bytes Taille estimée des modèles chargés.",
+        f"# TYPE {prefix}_model_memory_bytes gauge",
+    ]
+    for name, size_mb in usage["models"].items():
+        lines.append(f'{prefix}_model_memory_bytes{{model="{name}"}} {int(size_mb * 2 ** 20)}')
+    lines += [
+        f"# HELP {prefix}_model_memory_budget_bytes Budget mémoire des modèles (0 = illimité).",
+        f"# TYPE {prefix}_model_memory_budget_bytes gauge",
+        f"{prefix}_model_memory_budget_bytes {int((usage['budget_mb'] or 0) * 2 ** 20)}",
+    ]
+    for metric, key, help_text in (("loads_total", "loads", "Chargements de modèles."),
+                                   ("evictions_total", "evictions", "Modèles déchargés pour respecter le budget.")):
+        lines.append(f"# HELP {prefix}_model_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_model_{metric} counter")
+        for name, info in model_status().items():
+            lines.append(f'{prefix}_model_{metric}{{model="{name}"}} {info[key]}')
+    return "\n".join(lines) + "\n"
+
+def _torch_modules(obj):
+    """Modules PyTorch contenus dans l'objet d'un modèle (tuple tokenizer / modèle, pipeline, lecteur EasyOCR...)."""
+    import torch
+    if isinstance(obj, torch.nn.Module):
+        return [obj]
+    if isinstance(obj, (tuple, list)):
+        return [m for item in obj for m in _torch_modules(item)]
+    return [m for attr in ("model", "detector", "recognizer") if hasattr(obj, attr)
+            for m in _torch_modules(getattr(obj, attr))]
+
+def model_size_bytes(obj):
+    """
+    Taille (octets) des poids et tampons d'un modèle, y compris les poids int8 empaquetés
+    et sans compter deux fois les tenseurs partagés ; 0 si aucun module PyTorch n'y est trouvé.
+    """
+    if "torch" not in sys.modules:
+        return 0
+    import torch
+    seen, total = set(), 0
+    for module in _torch_modules(obj):
+        for value in module.state_dict(keep_vars=True).values():
+            # Couches quantifiées : poids compactés sous forme de tuple de tenseurs
+            for tensor in (value if isinstance(value, (tuple, list)) else (value,)):
+                if not isinstance(tensor, torch.Tensor):
+                    continue
+                try:
+                    key = tensor.data_ptr()
+                except RuntimeError:
+                    key = id(tensor)
+                if key not in seen:
+                    seen.add(key)
+                    total += tensor.numel() * tensor.element_size()
+    return total
+
+def rss_bytes():
+    """Mémoire résidente actuelle du processus (octets)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # Hors Linux : pic du processus (ko sous Linux, octets sous macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _release_memory():
+    """Libère les objets du modèle déchargé et rend au système la mémoire libre de l'allocateur (glibc)."""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def warm_up_models(names=None):
+    """
+    Précharge des modèles dans un thread en arrière-plan (ex. après le premier affichage).
+    Les modèles déjà chargés, en erreur ou déchargés pour respecter le budget mémoire sont
+    ignorés (un modèle déchargé n'est rechargé qu'à sa prochaine utilisation réelle) ;
+    renvoie le thread lancé (ou None).
+    """
+    def _wanted(name):
+        return name not in _models and _status[name]["state"] not in ("chargement", "erreur", "déchargé")
+
+    pending = [n for n in (names or list(_loaders)) if n in _loaders and _wanted(n)]
+    if not pending:
+        return None
+
+    def _run():
+        for name in pending:
+            if not _wanted(name):
+                continue
+            try:
+                get_model(name)
+            except Exception:
+                pass  # l'erreur est conservée dans model_status()
+
+    thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+# --- Précision d'inférence ---
+
+def bf16_supported():
+    import torch
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+def _conv1d_to_linear(model):
+    """GPT-2 / DialoGPT utilisent Conv1D (poids transposés) : conversion en nn.Linear pour la quantification."""
+    import torch
+    from transformers.pytorch_utils import Conv1D
+    for parent in list(model.modules()):
+        for child_name, child in parent.named_children():
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight = torch.nn.Parameter(child.weight.data.t().contiguous())
+                linear.bias = child.bias
+                setattr(parent, child_name, linear)
+    return model
+
+def apply_precision(model, precision=None):
+    """Convertit un modèle PyTorch (en mode évaluation) dans la précision demandée."""
+    import torch
+    precision = precision or PRECISION
+    if precision not in PRECISIONS:
+        raise ValueError(f"Précision non supportée : {precision} (attendu : {', '.join(PRECISIONS)})")
+
+    model.eval()
+    if precision == "int8":
+        model = torch.quantization.quantize_dynamic(_conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+    elif precision == "bf16":
+        if bf16_supported():
+            model = model.to(torch.bfloat16)
+        else:
+            print("bf16 non supporté par ce processeur, utilisation de fp32.")
+    return model
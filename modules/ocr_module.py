@@ -0,0 +1,203 @@
+# modules/ocr_module.py
+
+import time
+
+import numpy as np
+from PIL import Image
+from modules.model_module import register_model, get_model
+from modules.metrics_module import timed
+
+# Groupes de langues EasyOCR (un lecteur par groupe)
+OCR_GROUPS = {
+    "latin": ['fr', 'en', 'es', 'de'],
+    "arabic": ['ar', 'fa', 'ur', 'ug', 'en'],
+}
+ARABIC_LANGS = ['ar', 'fa', 'ur', 'ug']
+
+# Prétraitement : EasyOCR réduit de toute façon l'image à `canvas_size` (2560) pour la détection.
+# Les photos trop grandes sont réduites avant l'envoi ; les images très allongées (scans longs,
+# captures d'écran défilantes) gardent un petit côté lisible et sont découpées en tuiles.
+OCR_MAX_SIDE = 2560
+OCR_MIN_SIDE = 1024
+TILE_OVERLAP = 128
+# Lecture : boîtes d'une même ligne si leurs centres sont à moins de LINE_TOLERANCE hauteurs ;
+# nouveau paragraphe au-delà de PARAGRAPH_GAP hauteurs d'interligne
+LINE_TOLERANCE = 0.5
+PARAGRAPH_GAP = 0.8
+# Images traitées ensemble (mémoire bornée pour les grands lots de photos)
+OCR_CHUNK_IMAGES = 16
+
+def load_reader(group):
+    import easyocr
+    return easyocr.Reader(OCR_GROUPS[group], gpu=False)
+
+# Un lecteur par groupe, construit à la première utilisation puis réutilisé par tout le processus
+for _group in OCR_GROUPS:
+    register_model(f"ocr_{_group}", lambda g=_group: load_reader(g), f"OCR EasyOCR ({_group})")
+
+def language_group(lang):
+    """Renvoie le groupe EasyOCR à utiliser pour une langue."""
+    return "arabic" if lang in ARABIC_LANGS else "latin"
+
+def get_reader(group):
+    """Renvoie le lecteur EasyOCR du groupe (chargé une seule fois)."""
+    return get_model(f"ocr_{group}")
+
+def prepare_image(image, max_side=OCR_MAX_SIDE, min_side=OCR_MIN_SIDE, overlap=TILE_OVERLAP):
+    """
+    Réduit une image trop grande puis la découpe si besoin en tuiles de `max_side`
+    (même taille, la dernière complétée en blanc) le long de son grand côté.
+    Renvoie [(tableau, décalage x, décalage y, (axe, début, fin) de la zone gardée)].
+    """
+    image = image.convert("RGB")
+    w, h = image.size
+    scale = max_side / max(w, h)
+    if scale < 1:
+        scale = max(scale, min(1.0, min_side / min(w, h)))
+        image = image.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+        w, h = image.size
+
+    array = np.array(image)
+    axis = 0 if h >= w else 1  # 0 : tuiles verticales (y), 1 : horizontales (x)
+    length = array.shape[axis]
+    if length <= max_side:
+        return [(array, 0, 0, (axis, float("-inf"), float("inf")))]
+
+    step = max_side - overlap
+    starts = list(range(0, length - overlap, step))
+    tiles = []
+    for k, start in enumerate(starts):
+        end = min(start + max_side, length)
+        tile = array[start:end] if axis == 0 else array[:, start:end]
+        if end - start < max_side:
+            pad = [(0, 0)] * 3
+            pad[axis] = (0, max_side - (end - start))
+            tile = np.pad(tile, pad, constant_values=255)
+        # Zone gardée : les boîtes de la bande de recouvrement appartiennent à une seule tuile
+        keep_from = start + overlap / 2 if k > 0 else float("-inf")
+        keep_to = end - overlap / 2 if k < len(starts) - 1 else float("inf")
+        tiles.append((tile, start if axis == 1 else 0, start if axis == 0 else 0, (axis, keep_from, keep_to)))
+    return tiles
+
+def reading_order(boxes, rtl=False):
+    """
+    Reconstitue le texte à partir des boîtes [(x0, y0, x1, y1, texte)] :
+    lignes (centres verticaux proches), triées de gauche à droite (droite à gauche si `rtl`),
+    puis paragraphes séparés par un interligne anormalement grand.
+    Renvoie un paragraphe par ligne de texte (les lignes d'un paragraphe sont jointes).
+    """
+    if not boxes:
+        return ""
+    heights = sorted(y1 - y0 for _, y0, _, y1, _ in boxes)
+    median_h = max(heights[len(heights) // 2], 1)
+
+    lines = []
+    for box in sorted(boxes, key=lambda b: (b[1] + b[3]) / 2):
+        center = (box[1] + box[3]) / 2
+        if lines and abs(center - lines[-1]["center"]) <= LINE_TOLERANCE * median_h:
+            line = lines[-1]
+            line["boxes"].append(box)
+            line["center"] += (center - line["center"]) / len(line["boxes"])
+            line["top"], line["bottom"] = min(line["top"], box[1]), max(line["bottom"], box[3])
+        else:
+            lines.append({"boxes": [box], "center": center, "top": box[1], "bottom": box[3]})
+
+    paragraphs, current, previous = [], "", None
+    for line in lines:
+        words = sorted(line["boxes"], key=lambda b: -b[2] if rtl else b[0])
+        text = " ".join(b[4] for b in words).strip()
+        if previous is not None and line["top"] - previous["bottom"] > PARAGRAPH_GAP * median_h:
+            paragraphs.append(current)
+            current = ""
+        if not current:
+            current = text
+        elif current.endswith("-") and text[:1].islower():
+            current = current[:-1] + text  # mot coupé en fin de ligne
+        else:
+            current += " " + text
+        previous = line
+    paragraphs.append(current)
+    return "\n".join(p for p in paragraphs if p)
+
+def _boxes(results, offset_x, offset_y, keep):
+    """Résultats EasyOCR (detail=1) d'une tuile -> boîtes en coordonnées de l'image."""
+    axis, keep_from, keep_to = keep
+    boxes = []
+    for points, text, _confidence in results:
+        xs = [p[0] + offset_x for p in points]
+        ys = [p[1] + offset_y for p in points]
+        x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+        center = (y0 + y1) / 2 if axis == 0 else (x0 + x1) / 2
+        if keep_from <= center < keep_to:
+            boxes.append((x0, y0, x1, y1, text))
+    return boxes
+
+def iter_ocr_images(images, target_lang, batch_size=8, chunk_size=OCR_CHUNK_IMAGES):
+    """
+    Pipeline OCR par lots : prétraitement (réduction / tuiles), reconnaissance avec un seul
+    lecteur partagé (les tuiles de même taille passent ensemble dans `Reader.readtext_batched`),
+    puis ordre de lecture reconstruit à partir des boîtes.
+    Les images sont traitées par paquets de `chunk_size` ; renvoie un texte par image, dans l'ordre.
+    """
+    group = language_group(target_lang)
+    reader = get_reader(group)
+    images = list(images)
+    for chunk_start in range(0, len(images), chunk_size):
+        tiles = []  # (image, tableau, décalage x, décalage y, zone gardée)
+        for i, image in enumerate(images[chunk_start:chunk_start + chunk_size]):
+            tiles.extend((i, *tile) for tile in prepare_image(image))
+
+        # Regroupement par taille (la détection par lots exige des images de même dimension)
+        by_shape = {}
+        for t, tile in enumerate(tiles):
+            by_shape.setdefault(tile[1].shape, []).append(t)
+
+        boxes = [[] for _ in images[chunk_start:chunk_start + chunk_size]]
+        for indices in by_shape.values():
+            if len(indices) == 1:
+                results = [reader.readtext(tiles[indices[0]][1], batch_size=batch_size)]
+            else:
+                results = reader.readtext_batched([tiles[t][1] for t in indices], batch_size=batch_size)
+            for t, tile_results in zip(indices, results):
+                i, _, offset_x, offset_y, keep = tiles[t]
+                boxes[i].extend(_boxes(tile_results, offset_x, offset_y, keep))
+        for image_boxes in boxes:
+            yield reading_order(image_boxes, rtl=group == "arabic")
+
+@timed("ocr")
+def image_to_text_easyocr(image, target_lang):
+    """Texte d'une image (un paragraphe par ligne, dans l'ordre de lecture)."""
+    return next(iter_ocr_images([image], target_lang))
+
+@timed("ocr_batch")
+def readtext_batched(images, target_lang, batch_size=8):
+    """Reconnaît plusieurs images avec un seul lecteur ; renvoie un texte par image, dans l'ordre d'entrée."""
+    return list(iter_ocr_images(images, target_lang, batch_size=batch_size))
+
+def image_to_text_auto(image):
+    """
+    Texte d'une image d'écriture inconnue : lecture par le lecteur arabe (qui reconnaît aussi
+    l'alphabet latin de base), relue par le lecteur latin si le texte n'est pas en écriture arabe.
+    Renvoie (texte, langue représentative du groupe retenu : "ar" ou "fr").
+    """
+    from modules.langid_module import fast_detect
+    text = image_to_text_easyocr(image, "ar")
+    if fast_detect(text)[0] == "ar":
+        return text, "ar"
+    return image_to_text_easyocr(image, "fr"), "fr"
+
+def ocr_pdf_page(file_path, index, dpi, lang=None):
+    """
+    Rastérise une page de PDF scanné à `dpi` puis la reconnaît comme une photo, avec le lecteur
+    de la langue `lang` (langue du document ; écriture détectée sur la page si None).
+    Exécuté dans un processus de travail : renvoie (texte, secondes, langue utilisée).
+    """
+    import pdfplumber
+    start = time.perf_counter()
+    with pdfplumber.open(file_path) as pdf:
+        image = pdf.pages[index].to_image(resolution=dpi).original
+    if lang is None:
+        text, lang = image_to_text_auto(image)
+    else:
+        text = image_to_text_easyocr(image, lang)
+    return text, time.perf_counter() - start, lang
@@ -0,0 +1,118 @@
+# modules/quality_module.py
+# Contrôle qualité des modes de précision : compare la sortie NLLB quantifiée (int8 / bf16)
+# à la sortie fp32 sur un petit échantillon fixe, avec BLEU et chrF.
+#
+# Utilisation : python -m modules.quality_module [int8 bf16 ...]
+
+import math
+import sys
+import time
+from collections import Counter
+
+# Échantillon local fixe (français -> anglais) avec traductions de référence
+SAMPLE = [
+    ("Bonjour, comment allez-vous aujourd'hui ?", "Hello, how are you today?"),
+    ("Le contrat entre en vigueur à la date de sa signature.", "The contract comes into force on the date of its signature."),
+    ("Veuillez trouver ci-joint la facture du mois de mars.", "Please find attached the invoice for the month of March."),
+    ("La réunion est reportée à jeudi prochain à 14 heures.", "The meeting is postponed to next Thursday at 2 pm."),
+    ("Nous vous remercions de votre confiance.", "We thank you for your trust."),
+    ("Le patient doit prendre ce médicament deux fois par jour.", "The patient must take this medicine twice a day."),
+    ("Les résultats de l'étude seront publiés l'année prochaine.", "The results of the study will be published next year."),
+    ("Il fait très beau à Paris en ce moment.", "The weather is very nice in Paris right now."),
+    ("Toute modification doit être approuvée par écrit par les deux parties.", "Any modification must be approved in writing by both parties."),
+    ("Le train pour Lyon part du quai numéro trois.", "The train to Lyon leaves from platform number three."),
+]
+SAMPLE_SRC, SAMPLE_TGT = "fra_Latn", "eng_Latn"
+
+
+# --- Métriques ---
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+def corpus_bleu(hypotheses, references, max_n=4):
+    """BLEU corpus (tokens séparés par espaces, lissage +1 pour n > 1), entre 0 et 100."""
+    matches, totals = [0] * max_n, [0] * max_n
+    hyp_len = ref_len = 0
+    for hyp, ref in zip(hypotheses, references):
+        h, r = hyp.lower().split(), ref.lower().split()
+        hyp_len += len(h)
+        ref_len += len(r)
+        for n in range(1, max_n + 1):
+            h_grams, r_grams = _ngrams(h, n), _ngrams(r, n)
+            matches[n - 1] += sum(min(c, r_grams[g]) for g, c in h_grams.items())
+            totals[n - 1] += max(len(h) - n + 1, 0)
+    if hyp_len == 0:
+        return 0.0
+    log_precision = 0.0
+    for n in range(max_n):
+        smooth = 0 if n == 0 else 1
+        if matches[n] + smooth == 0:
+            return 0.0
+        log_precision += math.log((matches[n] + smooth) / (totals[n] + smooth)) / max_n
+    brevity = 1.0 if hyp_len > ref_len else math.exp(1 - ref_len / hyp_len)
+    return round(100 * brevity * math.exp(log_precision), 2)
+
+def corpus_chrf(hypotheses, references, max_n=6, beta=2):
+    """chrF (n-grammes de caractères 1..6, beta=2), entre 0 et 100."""
+    precisions, recalls = [], []
+    for n in range(1, max_n + 1):
+        match = hyp_total = ref_total = 0
+        for hyp, ref in zip(hypotheses, references):
+            h_grams = _ngrams(list(hyp.replace(" ", "")), n)
+            r_grams = _ngrams(list(ref.replace(" ", "")), n)
+            match += sum(min(c, r_grams[g]) for g, c in h_grams.items())
+            hyp_total += sum(h_grams.values())
+            ref_total += sum(r_grams.values())
+        precisions.append(match / hyp_total if hyp_total else 0.0)
+        recalls.append(match / ref_total if ref_total else 0.0)
+    p, r = sum(precisions) / max_n, sum(recalls) / max_n
+    if p + r == 0:
+        return 0.0
+    return round(100 * (1 + beta ** 2) * p * r / (beta ** 2 * p + r), 2)
+
+
+# --- Comparaison des précisions ---
+
+def _translate_sample(tokenizer, model, sources):
+    import torch
+    tokenizer.src_lang = SAMPLE_SRC
+    inputs = tokenizer(sources, return_tensors="pt", padding=True)
+    start = time.perf_counter()
+    with torch.inference_mode():
+        generated = model.generate(**inputs, forced_bos_token_id=tokenizer.convert_tokens_to_ids(SAMPLE_TGT), max_length=128)
+    return tokenizer.batch_decode(generated, skip_special_tokens=True), time.perf_counter() - start
+
+def compare_precisions(precisions=("int8", "bf16")):
+    """
+    Traduit l'échantillon avec NLLB en fp32 puis dans chaque précision demandée.
+    Renvoie, par précision : BLEU/chrF contre les références et contre la sortie fp32,
+    temps de génération et taille des poids.
+    """
+    from modules.model_module import model_size_bytes
+    from modules.translator_module import load_nllb
+
+    sources = [src for src, _ in SAMPLE]
+    references = [ref for _, ref in SAMPLE]
+    report = {}
+    baseline = None
+    for precision in ("fp32",) + tuple(p for p in precisions if p != "fp32"):
+        tokenizer, model = load_nllb(precision)
+        outputs, seconds = _translate_sample(tokenizer, model, sources)
+        if baseline is None:
+            baseline = outputs
+        report[precision] = {
+            "bleu_ref": corpus_bleu(outputs, references),
+            "chrf_ref": corpus_chrf(outputs, references),
+            "bleu_vs_fp32": corpus_bleu(outputs, baseline),
+            "chrf_vs_fp32": corpus_chrf(outputs, baseline),
+            "generate_seconds": round(seconds, 2),
+            "weights_mb": round(model_size_bytes(model) / 2 ** 20, 1),
+        }
+        del model
+    return report
+
+if __name__ == "__main__":
+    requested = tuple(sys.argv[1:]) or ("int8", "bf16")
+    for precision, scores in compare_precisions(requested).items():
+        print(precision, " ".join(f"{k}={v}" for k, v in scores.items()))
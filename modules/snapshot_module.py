@@ -0,0 +1,282 @@
+# modules/snapshot_module.py
+# Instantanés des modèles pour un démarrage rapide des processus de travail.
+# Chaque modèle est exporté une fois (poids safetensors + config / tokenizer) ; les processus
+# le rechargent ensuite par mmap : les pages de poids (lecture seule) restent dans le cache
+# disque du système et sont partagées entre tous les processus de la machine.
+#
+#   python -m modules.snapshot_module export [--models nllb lang_detector dialogpt whisper]
+#   python -m modules.snapshot_module measure --model nllb [--processes 4]
+#
+# get_model() utilise automatiquement l'instantané d'un modèle s'il existe dans SNAPSHOT_DIR.
+# Le partage concerne les poids fp32 : en int8 / bf16, la conversion crée une copie privée (plus petite).
+# EasyOCR n'est pas concerné (ses modèles sont chargés par la bibliothèque elle-même).
+
+import argparse
+import dataclasses
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+
+from modules.model_module import apply_precision, rss_bytes
+
+SNAPSHOT_DIR = os.environ.get("NEUROTRANSLATE_SNAPSHOT_DIR", "snapshots")
+WEIGHTS_FILE = "model.safetensors"
+META_FILE = "snapshot.json"
+
+# Modèles exportables : chargeur d'origine (poids fp32) et forme de l'objet renvoyé par get_model
+def _export_sources():
+    from modules.translator_module import load_nllb, load_lang_detector
+    from modules.chatbot_module import load_model
+    from modules.speech_module import load_whisper
+    return {
+        "nllb": (lambda: load_nllb("fp32"), "tokenizer_model"),
+        "lang_detector": (load_lang_detector, "pipeline"),
+        "dialogpt": (lambda: load_model("fp32"), "tokenizer_model"),
+        "whisper": (load_whisper, "model"),
+    }
+
+# Types safetensors -> torch
+_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def snapshot_path(name, directory=None):
+    return os.path.join(directory or SNAPSHOT_DIR or "", name)
+
+
+def has_snapshot(name, directory=None):
+    if not (directory or SNAPSHOT_DIR):
+        return False
+    path = snapshot_path(name, directory)
+    return os.path.exists(os.path.join(path, WEIGHTS_FILE)) and os.path.exists(os.path.join(path, META_FILE))
+
+
+# --- Poids : écriture / lecture par mmap ---
+
+def save_weights(module, path, extra=None):
+    """
+    Écrit les poids d'un module en safetensors. Les tenseurs partagés (poids liés) ne sont
+    écrits qu'une fois ; les autres noms sont notés comme alias et renvoyés.
+    """
+    from safetensors.torch import save_file
+    tensors, aliases, seen = {}, {}, {}
+    for name, tensor in module.state_dict().items():
+        key = (tensor.data_ptr(), tuple(tensor.shape), tuple(tensor.stride()), tensor.dtype)
+        if tensor.numel() and key in seen:
+            aliases[name] = seen[key]
+            continue
+        seen[key] = name
+        tensors[name] = tensor.detach().contiguous()
+    tensors.update(extra or {})
+    save_file(tensors, path)
+    return aliases
+
+
+def load_weights(path):
+    """
+    Lit un fichier safetensors sans copie : les tenseurs pointent directement dans une
+    projection mémoire privée (copie à l'écriture) du fichier.
+    """
+    import torch
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        if end == begin:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=start + begin).view(info["shape"])
+    return tensors
+
+
+def _assign_weights(module, path, aliases):
+    """Remplace les paramètres (non initialisés) du module par les tenseurs projetés en mémoire."""
+    state = load_weights(path)
+    for name, target in aliases.items():
+        state[name] = state[target]
+    extra = {name: state.pop(name) for name in list(state) if name.startswith("_")}
+    missing, unexpected = module.load_state_dict(state, strict=False, assign=True)
+    if missing or unexpected:
+        raise RuntimeError(f"Instantané incompatible ({path}) : manquants {missing[:5]}, inattendus {unexpected[:5]}")
+    return module.eval(), extra
+
+
+# --- Export / chargement ---
+
+def export_snapshot(name, directory=None):
+    """Charge le modèle `name` depuis sa source d'origine et l'écrit dans un instantané ; renvoie son dossier."""
+    source, kind = _export_sources()[name]
+    path = snapshot_path(name, directory)
+    os.makedirs(path, exist_ok=True)
+    obj = source()
+    meta = {"name": name, "kind": kind, "created": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    if kind == "model":  # Whisper (openai-whisper)
+        extra = {"_alignment_heads": obj.alignment_heads.to_dense()}
+        meta["dims"] = dataclasses.asdict(obj.dims)
+        meta["aliases"] = save_weights(obj, os.path.join(path, WEIGHTS_FILE), extra)
+    else:
+        tokenizer, model = (obj.tokenizer, obj.model) if kind == "pipeline" else obj
+        tokenizer.save_pretrained(path)
+        model.config.save_pretrained(path)
+        meta["class"] = type(model).__name__
+        if kind == "pipeline":
+            meta["task"] = obj.task
+        meta["aliases"] = save_weights(model, os.path.join(path, WEIGHTS_FILE))
+
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return path
+
+
+def load_snapshot(name, directory=None):
+    """Reconstruit l'objet renvoyé par get_model(name) à partir de son instantané (poids en mmap)."""
+    from transformers.modeling_utils import no_init_weights
+    path = snapshot_path(name, directory)
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    weights = os.path.join(path, WEIGHTS_FILE)
+
+    if meta["kind"] == "model":
+        from whisper.model import ModelDimensions, Whisper
+        with no_init_weights():
+            model = Whisper(ModelDimensions(**meta["dims"]))
+        model, extra = _assign_weights(model, weights, meta["aliases"])
+        model.register_buffer("alignment_heads", extra["_alignment_heads"].to_sparse(), persistent=False)
+        return model
+
+    import transformers
+    config = transformers.AutoConfig.from_pretrained(path)
+    with no_init_weights():
+        # Paramètres alloués mais jamais écrits (pas d'initialisation aléatoire) : aucune page touchée
+        model = getattr(transformers, meta["class"])(config)
+    model, _ = _assign_weights(model, weights, meta["aliases"])
+    tokenizer = transformers.AutoTokenizer.from_pretrained(path)
+    if meta["kind"] == "pipeline":
+        return transformers.pipeline(meta["task"], model=model, tokenizer=tokenizer, device=-1)
+    return tokenizer, apply_precision(model)
+
+
+# --- Mesure du démarrage (processus neufs) ---
+
+def _memory():
+    """Mémoire du processus en Mo : rss, rss_anon (privée), rss_file (pages de fichiers) et pss (partage réparti)."""
+    values = {"rss": rss_bytes() / 2 ** 20}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("RssAnon", "RssFile"):
+                    values[{"RssAnon": "rss_anon", "RssFile": "rss_file"}[key]] = int(rest.split()[0]) / 1024
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    values["pss"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass  # hors Linux : rss seulement
+    return {key: round(value, 1) for key, value in values.items()}
+
+
+def _touch(obj):
+    """Lit tous les poids (comme une inférence) pour que les pages soient effectivement en mémoire."""
+    import torch
+    modules = [getattr(obj, "model", obj)] if not isinstance(obj, tuple) else [o for o in obj if isinstance(o, torch.nn.Module)]
+    with torch.no_grad():
+        for module in modules:
+            for tensor in module.state_dict().values():
+                if isinstance(tensor, torch.Tensor) and tensor.is_floating_point():
+                    tensor.sum()
+
+
+def _child(name):
+    """Processus de mesure : charge le modèle, signale qu'il est prêt, puis mesure sa mémoire à la demande."""
+    from modules.model_module import get_model
+    import modules.translator_module, modules.chatbot_module, modules.speech_module  # noqa: F401 (enregistrements)
+    start = time.perf_counter()
+    _touch(get_model(name))
+    load_seconds = time.perf_counter() - start
+    print("ready", flush=True)
+    sys.stdin.readline()  # tous les processus sont chargés : mesure de la mémoire partagée
+    print(json.dumps({"load_seconds": round(load_seconds, 2), **_memory()}), flush=True)
+
+
+def measure_startup(name, processes=1, use_snapshot=True):
+    """Lance `processes` processus neufs qui chargent `name` en même temps ; renvoie leurs mesures."""
+    # Sans instantané : dossier vide dans l'environnement, get_model() revient au chargeur d'origine
+    env = dict(os.environ, PYTHONUNBUFFERED="1", NEUROTRANSLATE_SNAPSHOT_DIR=SNAPSHOT_DIR if use_snapshot else "")
+    command = [sys.executable, "-m", "modules.snapshot_module", "_child", name]
+    started = time.perf_counter()
+    children = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+                for _ in range(processes)]
+    results = []
+    try:
+        ready = []
+        for child in children:
+            line = child.stdout.readline().strip()
+            if line != "ready":
+                raise RuntimeError(f"Échec du chargement de {name} dans un processus de mesure")
+            ready.append(round(time.perf_counter() - started, 2))
+        for child in children:
+            child.stdin.write("\n")
+            child.stdin.flush()
+        for child, startup in zip(children, ready):
+            results.append({"startup_seconds": startup, **json.loads(child.stdout.readline())})
+    finally:
+        for child in children:
+            child.stdin.close()
+            child.wait()
+    return {
+        "processes": results,
+        "total_rss_mb": round(sum(r.get("rss", 0) for r in results), 1),
+        "total_pss_mb": round(sum(r.get("pss", 0) for r in results), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Instantanés des modèles (poids partagés par mmap)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="exporter les modèles dans SNAPSHOT_DIR")
+    export.add_argument("--models", nargs="+", default=["nllb", "lang_detector", "dialogpt", "whisper"])
+    export.add_argument("--dir", default=None)
+    measure = sub.add_parser("measure", help="comparer démarrage et mémoire : chargement d'origine / instantané")
+    measure.add_argument("--model", default="nllb")
+    measure.add_argument("--processes", type=int, default=2)
+    child = sub.add_parser("_child")
+    child.add_argument("model")
+    args = parser.parse_args(argv)
+
+    if args.command == "_child":
+        _child(args.model)
+    elif args.command == "export":
+        for name in args.models:
+            start = time.perf_counter()
+            path = export_snapshot(name, args.dir)
+            print(f"{name} -> {path} ({time.perf_counter() - start:.1f} s)")
+    else:
+        if not has_snapshot(args.model):
+            parser.error(f"pas d'instantané pour {args.model} : lancez d'abord la commande export")
+        report = {
+            "model": args.model,
+            "from_pretrained": measure_startup(args.model, args.processes, use_snapshot=False),
+            "snapshot": measure_startup(args.model, args.processes, use_snapshot=True),
+        }
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
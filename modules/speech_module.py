@@ -0,0 +1,96 @@
+# modules/speech_module.py
+
+import subprocess
+import threading
+import numpy as np
+from modules.model_module import register_model, get_model
+from modules.metrics_module import timed
+
+WHISPER_MODEL = "base"
+SAMPLE_RATE = 16000     # whisper.audio.SAMPLE_RATE
+CHUNK_SECONDS = 30      # fenêtre native de Whisper
+OVERLAP_SECONDS = 2     # recouvrement entre morceaux pour ne pas couper de mots
+
+# Whisper installe des hooks de KV-cache sur le modèle pendant le décodage :
+# un seul décodage à la fois sur l'instance partagée.
+_model_lock = threading.Lock()
+
+def load_whisper():
+    import whisper
+    return whisper.load_model(WHISPER_MODEL)
+
+register_model("whisper", load_whisper, f"Transcription (Whisper {WHISPER_MODEL})")
+
+def get_whisper():
+    """Renvoie le modèle Whisper (chargé une seule fois pour tout le processus)."""
+    return get_model("whisper")
+
+@timed("audio_decode")
+def decode_audio(data, sr=SAMPLE_RATE):
+    """
+    Décode des octets mp3/wav en signal float32 mono à 16 kHz.
+    ffmpeg lit sur stdin et écrit du PCM brut sur stdout : aucun fichier temporaire.
+    """
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"
+    ]
+    try:
+        out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Décodage audio impossible : {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+@timed("whisper_detect")
+def detect_audio_language(audio):
+    """Détection de langue native de Whisper sur les 30 premières secondes."""
+    import whisper
+    model = get_whisper()
+    segment = whisper.pad_or_trim(audio)
+    mel = whisper.log_mel_spectrogram(segment, getattr(model.dims, "n_mels", 80)).to(model.device)
+    with _model_lock:
+        _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+def split_chunks(audio, chunk_seconds=CHUNK_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    """Découpe le signal en morceaux de `chunk_seconds` qui se recouvrent de `overlap_seconds`."""
+    size = chunk_seconds * SAMPLE_RATE
+    overlap = overlap_seconds * SAMPLE_RATE
+    if len(audio) <= size:
+        return [audio]
+    return [audio[start:start + size] for start in range(0, len(audio) - overlap, size - overlap)]
+
+def merge_overlap(text, addition, max_words=12):
+    """Concatène deux transcriptions en supprimant les mots répétés dus au recouvrement."""
+    left, right = text.split(), addition.split()
+    norm = lambda words: [w.lower().strip(".,;:!?¿¡") for w in words]
+    for n in range(min(max_words, len(left), len(right)), 0, -1):
+        if norm(left[-n:]) == norm(right[:n]):
+            right = right[n:]
+            break
+    return " ".join(left + right)
+
+@timed("whisper_transcribe")
+def transcribe_stream(data, language=None):
+    """
+    Transcrit un enregistrement morceau par morceau.
+    Générateur : renvoie (texte partiel, langue) après chaque morceau.
+    """
+    audio = decode_audio(data) if isinstance(data, (bytes, bytearray)) else data
+    if language is None:
+        language = detect_audio_language(audio)
+
+    model = get_whisper()
+    text = ""
+    for chunk in split_chunks(audio):
+        with _model_lock:
+            result = model.transcribe(chunk, language=language, fp16=False)
+        text = merge_overlap(text, result["text"].strip())
+        yield text, language
+
+def transcribe_audio(data, language=None):
+    """Transcrit un enregistrement complet. Renvoie {"text": ..., "language": ...}."""
+    text, language = "", language
+    for text, language in transcribe_stream(data, language):
+        pass
+    return {"text": text, "language": language}
@@ -1,11 +1,30 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from modules.cache_module import TranslationCache, make_key
+from modules.memory_module import TranslationMemory
+from modules.model_module import register_model, get_model, apply_precision
+from modules.langid_module import fast_detect
+from modules.metrics_module import span, timed
 
-# Détecteur de langue
-lang_detector = pipeline(
-    "text-classification",
-    model="papluca/xlm-roberta-base-language-detection",
-    device=-1
-)
+# Cache des détections / traductions (LRU mémoire + SQLite local)
+cache = TranslationCache()
+# Mémoire de traduction : segments quasi identiques déjà traduits (correspondance approchée)
+memory = TranslationMemory()
+
+# Détecteur de langue (chargé à la première détection)
+def load_lang_detector():
+    from transformers import pipeline
+    return pipeline(
+        "text-classification",
+        model="papluca/xlm-roberta-base-language-detection",
+        device=-1
+    )
+
+register_model("lang_detector", load_lang_detector, "Détection de langue (xlm-roberta)")
 
 NLLB_LANGS = {
     "fr": "fra_Latn",
@@ -15,25 +34,451 @@ NLLB_LANGS = {
     "ar": "arb_Arab"
 }
 
+# En dessous de ce seuil, la détection rapide est confirmée par xlm-roberta
+FAST_DETECT_THRESHOLD = 0.75
+
+def _best_supported(scores):
+    """Parmi toutes les étiquettes du classifieur, garde la meilleure langue de NLLB_LANGS."""
+    supported = [r for r in scores if r["label"] in NLLB_LANGS]
+    best = max(supported, key=lambda r: r["score"]) if supported else {"label": "en", "score": 0.0}
+    return best["label"], round(best["score"], 4)
+
+@timed("detect")
+def detect_languages(texts, threshold=FAST_DETECT_THRESHOLD, batch_size=16):
+    """
+    Détection par lots en deux niveaux :
+    1. détecteur rapide (écriture + n-grammes) ;
+    2. xlm-roberta, en un seul appel, pour les textes dont la confiance est < `threshold`.
+    Les étiquettes renvoyées appartiennent toujours à NLLB_LANGS.
+    """
+    keys = [make_key("langid", t[:512]) for t in texts]
+    cached = cache.get_many(keys)
+    results = [tuple(cached[k]) if k in cached else None for k in keys]
+
+    slow = []
+    for i, text in enumerate(texts):
+        if results[i] is None:
+            label, score = fast_detect(text)
+            if score >= threshold:
+                results[i] = (label, score)
+            else:
+                slow.append(i)
+
+    if slow:
+        outputs = get_model("lang_detector")([texts[i][:512] for i in slow], top_k=None, truncation=True, batch_size=batch_size)
+        for i, scores in zip(slow, outputs):
+            results[i] = _best_supported(scores)
+
+    cache.set_many({keys[i]: list(results[i]) for i in range(len(texts)) if keys[i] not in cached})
+    return results
+
 def detect_language(text):
-    result = lang_detector(text[:512])[0]
-    return result["label"], round(result["score"],4)
+    return detect_languages([text])[0]
 
-# NLLB modèle
+# NLLB modèle (chargé à la première traduction)
 model_nllb_name = "facebook/nllb-200-distilled-600M"
-tokenizer_nllb = AutoTokenizer.from_pretrained(model_nllb_name)
-model_nllb = AutoModelForSeq2SeqLM.from_pretrained(model_nllb_name)
+
+def load_nllb(precision=None):
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    tokenizer = AutoTokenizer.from_pretrained(model_nllb_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_nllb_name)
+    return tokenizer, apply_precision(model, precision)
+
+register_model("nllb", load_nllb, "Traduction (NLLB-200 600M)")
+
+# Découpage en phrases : ponctuation finale latine / arabe suivie d'un espace
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;؟。])\s+")
+# Au-delà, une "phrase" est redécoupée en morceaux de mots (évite la troncature à 512 tokens)
+MAX_SEGMENT_WORDS = 150
+
+def split_sentences(text):
+    """Découpe une ligne de texte en segments traduisibles séparément."""
+    segments = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        words = sentence.split()
+        for i in range(0, len(words), MAX_SEGMENT_WORDS):
+            segments.append(" ".join(words[i:i + MAX_SEGMENT_WORDS]))
+    return segments
+
+def encode_segments(tokenizer, texts, src_lang, max_length=512):
+    """
+    Tokenise des segments pour NLLB sans modifier `tokenizer.src_lang` (état partagé
+    entre sessions) : [code langue source] + tokens + [eos], construit pour chaque requête.
+    """
+    lang_id = tokenizer.convert_tokens_to_ids(src_lang)
+    ids = tokenizer(list(texts), add_special_tokens=False, truncation=True, max_length=max_length - 2)["input_ids"]
+    return [[lang_id] + x + [tokenizer.eos_token_id] for x in ids]
+
+def generate_batch(tokenizer, model, batch_ids, tgt_lang, max_length=512):
+    """Un appel `generate` sur un lot de séquences déjà tokenisées (complétées par padding)."""
+    import torch
+    inputs = tokenizer.pad({"input_ids": batch_ids}, return_tensors="pt")
+    with span("nllb_generate") as s, torch.inference_mode():
+        generated_tokens = model.generate(
+            **inputs,
+            forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt_lang),
+            max_length=max_length
+        )
+        s.tokens = int(inputs["attention_mask"].sum()) + generated_tokens.numel()
+    return tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+
+def generate_multi(tokenizer, model, batch_ids, rows, max_length=512):
+    """
+    Encode une seule fois un lot de séquences, puis décode toutes les paires
+    (indice de séquence, langue cible) de `rows` dans un même `generate`.
+    Chaque ligne du décodeur commence par [decoder_start, code langue cible] :
+    le token de langue est forcé ligne par ligne via `decoder_input_ids`.
+    """
+    import torch
+    from transformers.modeling_outputs import BaseModelOutput
+    inputs = tokenizer.pad({"input_ids": batch_ids}, return_tensors="pt")
+    index = torch.tensor([i for i, _ in rows])
+    start = model.config.decoder_start_token_id
+    decoder_input_ids = torch.tensor([[start, tokenizer.convert_tokens_to_ids(tgt)] for _, tgt in rows])
+    with span("nllb_generate") as s, torch.inference_mode():
+        hidden = model.get_encoder()(**inputs).last_hidden_state
+        generated_tokens = model.generate(
+            encoder_outputs=BaseModelOutput(last_hidden_state=hidden.index_select(0, index)),
+            attention_mask=inputs["attention_mask"].index_select(0, index),
+            decoder_input_ids=decoder_input_ids,
+            max_length=max_length
+        )
+        s.tokens = int(inputs["attention_mask"].sum()) + generated_tokens.numel()
+    return tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+
+def _length_buckets(indices, lengths, batch_size, max_batch_tokens, rows_per_item=1):
+    """
+    Trie les indices par longueur et les regroupe en lots d'au plus `batch_size`
+    lignes / `max_batch_tokens` tokens (chaque élément occupe `rows_per_item` lignes).
+    """
+    order = sorted(indices, key=lambda i: lengths[i])
+    batches, current = [], []
+    for i in order:
+        longest = lengths[i]  # trié : le dernier ajouté est le plus long
+        rows = (len(current) + 1) * rows_per_item
+        if current and (rows > batch_size or longest * rows > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+def translate_batch(texts, src_lang, tgt_lang, max_length=512, batch_size=16, max_batch_tokens=4096):
+    """
+    Traduit une liste de segments par lots.
+    Les segments sont triés par longueur (en tokens) pour limiter le padding,
+    puis regroupés en lots d'au plus `batch_size` segments / `max_batch_tokens` tokens.
+    Les traductions sont renvoyées dans l'ordre d'origine ; seuls les segments
+    absents du cache et de la mémoire de traduction passent par le modèle. Les petites
+    requêtes passent par l'ordonnanceur (s'il est actif) pour être regroupées avec
+    celles des autres sessions.
+    """
+    if not texts:
+        return []
+
+    keys = [make_key("translate", t, src_lang, tgt_lang) for t in texts]
+    cached = cache.get_many(keys)
+    todo = [i for i, key in enumerate(keys) if key not in cached]
+    results = [cached.get(key, "") for key in keys]
+    todo = _from_memory(texts, todo, src_lang, tgt_lang, results)
+    if not todo:
+        return results
+
+    tokenizer_nllb, model_nllb = get_model("nllb")
+    encoded = dict(zip(todo, encode_segments(tokenizer_nllb, [texts[i] for i in todo], src_lang, max_length)))
+
+    if scheduler is not None and len(todo) <= scheduler.max_batch_size:
+        futures = [(i, scheduler.submit(encoded[i], tgt_lang, max_length)) for i in todo]
+        for i, future in futures:
+            results[i] = future.result()
+        _remember(texts, todo, src_lang, tgt_lang, results, keys)
+        return results
+
+    # Buckets de longueurs proches
+    lengths = {i: len(encoded[i]) for i in todo}
+    for batch in _length_buckets(todo, lengths, batch_size, max_batch_tokens):
+        translations = generate_batch(tokenizer_nllb, model_nllb, [encoded[i] for i in batch], tgt_lang, max_length)
+        for i, translation in zip(batch, translations):
+            results[i] = translation
+    _remember(texts, todo, src_lang, tgt_lang, results, keys)
+    return results
+
+def _from_memory(texts, todo, src_lang, tgt_lang, results):
+    """
+    Sert depuis la mémoire de traduction les segments de `todo` qui s'y trouvent ; renvoie le reste.
+    Ces traductions ne vont pas dans le cache exact : elles suivent les changements de la mémoire.
+    """
+    if not todo:
+        return todo
+    matches = memory.lookup_many([texts[i] for i in todo], src_lang, tgt_lang)
+    for j, (translation, score) in matches.items():
+        results[todo[j]] = translation
+    return [i for j, i in enumerate(todo) if j not in matches]
+
+def _remember(texts, todo, src_lang, tgt_lang, results, keys):
+    """Enregistre les traductions produites par le modèle (cache exact + mémoire de traduction)."""
+    cache.set_many({keys[i]: results[i] for i in todo})
+    memory.add_many([(texts[i], results[i]) for i in todo], src_lang, tgt_lang)
+
+def translate_batch_multi(texts, src_lang, tgt_langs, max_length=512, batch_size=16, max_batch_tokens=4096):
+    """
+    Traduit une liste de segments vers plusieurs langues cibles ; renvoie {tgt_lang: [traductions]}.
+    Chaque segment est tokenisé et passé dans l'encodeur une seule fois, quel que soit
+    le nombre de cibles ; seules les paires (segment, cible) absentes du cache et de la
+    mémoire de traduction sont décodées.
+    `batch_size` / `max_batch_tokens` bornent le nombre de lignes décodées par lot.
+    """
+    tgt_langs = list(dict.fromkeys(tgt_langs))
+    results = {tgt: [""] * len(texts) for tgt in tgt_langs}
+    if not texts:
+        return results
+
+    keys = {tgt: [make_key("translate", t, src_lang, tgt) for t in texts] for tgt in tgt_langs}
+    cached = cache.get_many([key for tgt in tgt_langs for key in keys[tgt]])
+    missing = {}
+    for tgt in tgt_langs:
+        todo = []
+        for i, key in enumerate(keys[tgt]):
+            if key in cached:
+                results[tgt][i] = cached[key]
+            else:
+                todo.append(i)
+        for i in _from_memory(texts, todo, src_lang, tgt, results[tgt]):
+            missing.setdefault(i, []).append(tgt)
+    if not missing:
+        return results
+
+    tokenizer_nllb, model_nllb = get_model("nllb")
+    todo = sorted(missing)
+    encoded = dict(zip(todo, encode_segments(tokenizer_nllb, [texts[i] for i in todo], src_lang, max_length)))
+    lengths = {i: len(encoded[i]) for i in todo}
+
+    # Un segment occupe autant de lignes de décodeur que de cibles manquantes (au plus len(tgt_langs))
+    rows_per_item = max(len(tgts) for tgts in missing.values())
+    for batch in _length_buckets(todo, lengths, max(batch_size, rows_per_item), max_batch_tokens, rows_per_item):
+        rows = [(b, tgt) for b, i in enumerate(batch) for tgt in missing[i]]
+        translations = generate_multi(tokenizer_nllb, model_nllb, [encoded[i] for i in batch], rows, max_length)
+        for (b, tgt), translation in zip(rows, translations):
+            results[tgt][batch[b]] = translation
+    for tgt in tgt_langs:
+        _remember(texts, [i for i in todo if tgt in missing[i]], src_lang, tgt, results[tgt], keys[tgt])
+    return results
+
+# --- Ordonnanceur de micro-lots (sessions concurrentes) ---
+
+class _Pending:
+    __slots__ = ("input_ids", "tgt_lang", "max_length", "future", "enqueued")
+
+    def __init__(self, input_ids, tgt_lang, max_length):
+        self.input_ids = input_ids
+        self.tgt_lang = tgt_lang
+        self.max_length = max_length
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+    @property
+    def group(self):
+        """Requêtes décodables ensemble : même langue cible et même longueur maximale."""
+        return self.tgt_lang, self.max_length
+
+class TranslationScheduler:
+    """
+    Regroupe les segments soumis par des appelants concurrents en un seul `generate`.
+    Un thread dédié prend la première requête en attente, attend au plus `max_wait`
+    secondes d'autres requêtes vers la même langue cible et de même `max_length` (la langue
+    source est déjà encodée dans chaque séquence), jusqu'à `max_batch_size`, puis rend
+    chaque résultat à son appelant via un Future.
+    La file est bornée (`max_queue`) : au-delà, `submit` échoue après `submit_timeout`.
+    Après `shutdown`, les requêtes non servies échouent (RuntimeError) au lieu de rester en attente.
+    """
+
+    def __init__(self, max_batch_size=16, max_wait=0.02, max_queue=256, submit_timeout=5.0, max_length=512):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.submit_timeout = submit_timeout
+        self.max_length = max_length
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0, "wait_seconds": 0.0, "max_queue_depth": 0}
+        self._stats_lock = threading.Lock()
+        self._held = deque()  # requêtes retirées de la file mais pas encore servies (autre groupe)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="nllb-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, input_ids, tgt_lang, max_length=None):
+        """Soumet une séquence tokenisée ; renvoie un Future (texte traduit)."""
+        if self._closed:
+            raise RuntimeError("Ordonnanceur de traduction arrêté")
+        pending = _Pending(input_ids, tgt_lang, max_length or self.max_length)
+        try:
+            self.queue.put(pending, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.stats["rejected"] += 1
+            raise RuntimeError("Ordonnanceur de traduction saturé, réessayez plus tard") from None
+        with self._stats_lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+        if self._closed:
+            # Arrêt concurrent : la requête a pu être déposée après le vidage de la file
+            self._thread.join()
+            self._fail_pending()
+        return pending.future
+
+    def _next_batch(self):
+        first = self._held.popleft() if self._held else self.queue.get()
+        if first is None:
+            return None
+        batch, others = [first], deque()
+        # Requêtes déjà retenues pour le même groupe
+        for item in list(self._held):
+            if len(batch) < self.max_batch_size and item.group == first.group:
+                batch.append(item)
+            else:
+                others.append(item)
+        self._held = others
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)  # arrêt traité au tour suivant
+                break
+            if item.group == first.group:
+                batch.append(item)
+            else:
+                self._held.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None or self._closed:
+                self._fail_pending(batch or [])
+                return
+            now = time.perf_counter()
+            with self._stats_lock:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["wait_seconds"] += sum(now - item.enqueued for item in batch)
+            try:
+                tokenizer, model = get_model("nllb")
+                translations = generate_batch(tokenizer, model, [item.input_ids for item in batch],
+                                              batch[0].tgt_lang, batch[0].max_length)
+                for item, translation in zip(batch, translations):
+                    item.future.set_result(translation)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        batches = stats["batches"] or 1
+        return {
+            "queue_depth": self.queue.qsize() + len(self._held),
+            "max_queue_depth": stats["max_queue_depth"],
+            "requests": stats["requests"],
+            "batches": stats["batches"],
+            "rejected": stats["rejected"],
+            "avg_batch_size": round(stats["requests"] / batches, 2),
+            "avg_batch_fill": round(stats["requests"] / batches / self.max_batch_size, 3),
+            "avg_wait_ms": round(1000 * stats["wait_seconds"] / (stats["requests"] or 1), 2),
+        }
+
+    def _fail_pending(self, batch=()):
+        """Fait échouer les requêtes du lot non lancé, restées dans la file ou retenues (après l'arrêt)."""
+        items = list(batch) + list(self._held)
+        self._held.clear()
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                items.append(item)
+        for item in items:
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("Ordonnanceur de traduction arrêté"))
+
+    def shutdown(self):
+        """Arrête le thread : le lot en cours de décodage se termine, les requêtes en attente échouent."""
+        self._closed = True
+        self.queue.put(None)
+        self._thread.join()
+
+scheduler = None
+_scheduler_lock = threading.Lock()
+
+def enable_scheduler(**options):
+    """Démarre (une seule fois par processus) l'ordonnanceur de micro-lots et le renvoie."""
+    global scheduler
+    with _scheduler_lock:
+        if scheduler is None:
+            scheduler = TranslationScheduler(**options)
+        return scheduler
 
 # Traduction
-def translate_text(text, src_lang, tgt_lang, max_length=512):
-    tokenizer_nllb.src_lang = src_lang
-    inputs = tokenizer_nllb(text, return_tensors="pt", max_length=max_length, truncation=True)
-    
-    # Attention: certaines versions transformers n'ont pas lang_code_to_id
-    forced_bos_token_id = tokenizer_nllb.lang_code_to_id[tgt_lang]  # Si erreur ici, il faut une autre version de transformers
-    generated_tokens = model_nllb.generate(
-        **inputs,
-        forced_bos_token_id=forced_bos_token_id,
-        max_length=max_length
-    )
-    return tokenizer_nllb.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+@timed("translate")
+def translate_text(text, src_lang, tgt_lang, max_length=512, batch_size=16):
+    """
+    Traduit un texte de longueur quelconque : découpage en phrases,
+    traduction par lots, puis réassemblage en conservant les retours à la ligne.
+    `tgt_lang` peut être une liste de codes : le texte est alors encodé une seule fois
+    et la fonction renvoie {tgt_lang: texte traduit}.
+    """
+    segments, layout = segment_text(text)
+    if isinstance(tgt_lang, (list, tuple)):
+        translated = translate_batch_multi(segments, src_lang, tgt_lang, max_length=max_length, batch_size=batch_size)
+        return {tgt: assemble(translations, layout) for tgt, translations in translated.items()}
+    return assemble(translate_batch(segments, src_lang, tgt_lang, max_length=max_length, batch_size=batch_size), layout)
+
+def segment_text(text):
+    """Découpe un texte en segments ; `layout` donne, pour chaque ligne, la plage de ses segments."""
+    segments, layout = [], []
+    for line in text.split("\n"):
+        line_segments = split_sentences(line)
+        layout.append(range(len(segments), len(segments) + len(line_segments)))
+        segments.extend(line_segments)
+    return segments, layout
+
+def assemble(translated, layout):
+    """Réassemble les segments traduits en conservant les retours à la ligne."""
+    return "\n".join(" ".join(translated[i] for i in line_range) for line_range in layout)
+
+def memory_suggestions(text, src_lang, tgt_lang, max_segments=200):
+    """
+    Suggestions de la mémoire de traduction pour les segments (les `max_segments` premiers)
+    qu'elle ne sert pas directement : [{"segment", "suggestion", "score"}], à relire par l'utilisateur.
+    """
+    segments = list(dict.fromkeys(s for s in segment_text(text)[0] if s.strip()))[:max_segments]
+    found = memory.suggest_many(segments, src_lang, tgt_lang)
+    return [{"segment": segments[i], "suggestion": translation, "score": score}
+            for i, (translation, score) in sorted(found.items())]
+
+@timed("translate_live")
+def translate_incremental(text, src_lang, tgt_lang, memo, max_length=512, batch_size=16):
+    """
+    Traduction en direct d'un texte en cours d'édition. `memo` ({empreinte de segment: traduction},
+    propre à une session et à une paire de langues) garde les segments déjà traduits : seuls
+    les segments nouveaux ou modifiés sont traduits, en un seul lot. Le coût d'une modification
+    dépend donc de sa taille, pas de celle du texte.
+    `memo` est mis à jour et ne conserve que les segments du texte courant.
+    Renvoie (texte traduit, nombre de segments retraduits).
+    """
+    segments, layout = segment_text(text)
+    keys = [make_key("live", segment, src_lang, tgt_lang) for segment in segments]
+    changed = {key: segment for key, segment in zip(keys, segments) if key not in memo}
+    if changed:
+        translated = translate_batch(list(changed.values()), src_lang, tgt_lang, max_length=max_length, batch_size=batch_size)
+        memo.update(zip(changed, translated))
+    current = {key: memo[key] for key in keys}
+    memo.clear()
+    memo.update(current)
+    return assemble([current[key] for key in keys], layout), len(changed)
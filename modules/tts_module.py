@@ -1,6 +1,83 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from gtts import gTTS
+from modules.metrics_module import span
+
+# --- Moteurs de synthèse (interchangeables) ---
+
+class TTSBackend:
+    """Interface d'un moteur TTS : synthesize(text, lang) renvoie des octets audio (mp3)."""
+
+    def synthesize(self, text, lang):
+        raise NotImplementedError
+
+class GTTSBackend(TTSBackend):
+    """Google Text-to-Speech (nécessite un accès réseau)."""
+
+    def synthesize(self, text, lang):
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+_backend = GTTSBackend()
+
+def set_backend(backend):
+    """Remplace le moteur TTS (moteur local hors ligne, stub de test...) et vide le cache."""
+    global _backend
+    _backend = backend
+    clear_cache()
+
+# --- Cache audio borné (clé : hash du texte + langue) ---
+
+AUDIO_CACHE_ITEMS = 128
+AUDIO_CACHE_BYTES = 64 * 2 ** 20
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+def _key(text, lang):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), lang
+
+def clear_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+def synthesize(text, lang="en"):
+    """Renvoie l'audio mp3 (octets) du texte, depuis le cache si possible."""
+    global _cache_bytes
+    key = _key(text, lang)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    with span("tts"):
+        audio = _backend.synthesize(text, lang)
+
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = audio
+            _cache_bytes += len(audio)
+            while len(_cache) > AUDIO_CACHE_ITEMS or _cache_bytes > AUDIO_CACHE_BYTES:
+                _, evicted = _cache.popitem(last=False)
+                _cache_bytes -= len(evicted)
+    return audio
+
+# --- Génération concurrente, hors du chemin critique ---
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tts")
+
+def synthesize_async(text, lang="en"):
+    """Lance la synthèse en arrière-plan ; renvoie un Future dont le résultat est l'audio (octets)."""
+    return _executor.submit(synthesize, text, lang)
 
 def text_to_speech(text, lang="en", filename="output.mp3"):
-    tts = gTTS(text=text, lang=lang)
-    tts.save(filename)
+    with open(filename, "wb") as f:
+        f.write(synthesize(text, lang))
     return filename
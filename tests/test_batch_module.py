@@ -0,0 +1,81 @@
+# tests/test_batch_module.py
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from modules import batch_module
+
+
+@pytest.fixture
+def tree(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    for name in ("a.txt", "rapport.pdf", "rapport.docx", "sub/b.TXT", "image.png"):
+        (docs / name).write_text("x", encoding="utf-8")
+    return docs
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Exécute les traductions dans des threads, avec un translate_file factice."""
+    calls = []
+
+    def translate_file(file_path, target, output_path, fmt, keep_layout=False):
+        calls.append((Path(file_path).name, target))
+        if Path(file_path).name == "a.txt" and target == "de":
+            raise RuntimeError("panne")
+        return {"file": file_path, "target": target, "status": "done", "output": output_path, "chars": 1}
+
+    monkeypatch.setattr(batch_module, "translate_file", translate_file)
+    monkeypatch.setattr(batch_module, "ProcessPoolExecutor",
+                        lambda max_workers, **_: ThreadPoolExecutor(max_workers))
+    return calls
+
+
+def test_collect_files(tree):
+    files = batch_module.collect_files([str(tree), str(tree / "a.txt"), str(tree / "image.png")])
+    assert [(f.name, str(r)) for f, r in files] == [
+        ("a.txt", "a.txt"), ("rapport.docx", "rapport.docx"), ("rapport.pdf", "rapport.pdf"),
+        ("b.TXT", str(Path("sub", "b.TXT"))), ("a.txt", "a.txt"),
+    ]
+
+
+def test_load_manifest_ignores_errors_and_truncated_lines(tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    assert batch_module.load_manifest(str(manifest)) == set()
+    manifest.write_text(
+        json.dumps({"file": "a.txt", "target": "en", "status": "done"}) + "\n"
+        + json.dumps({"file": "b.txt", "target": "en", "status": "error", "error": "x"}) + "\n"
+        + '{"file": "c.txt", "tar', encoding="utf-8")
+    assert batch_module.load_manifest(str(manifest)) == {("a.txt", "en")}
+
+
+def test_run_resumes_from_manifest(tree, tmp_path, calls):
+    out = tmp_path / "out"
+    stats = batch_module.run([str(tree)], ["en", "de"], str(out), workers=2)
+    assert (stats["done"], stats["error"]) == (7, 1)
+    assert len(calls) == 8
+    # Extension source conservée dans le nom de sortie
+    records = [json.loads(line) for line in (out / "manifest.jsonl").read_text(encoding="utf-8").splitlines()]
+    outputs = {Path(r["output"]).relative_to(out).as_posix() for r in records if r["status"] == "done"}
+    assert {"rapport.pdf.en.txt", "rapport.docx.en.txt", "sub/b.TXT.de.txt"} <= outputs
+
+    # Seule la traduction en erreur est refaite
+    calls.clear()
+    stats = batch_module.run([str(tree)], ["en", "de"], str(out), workers=2)
+    assert calls == [("a.txt", "de")]
+    assert (stats["done"], stats["error"]) == (0, 1)
+
+
+def test_output_collision(tree, tmp_path, calls):
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "a.txt").write_text("y", encoding="utf-8")
+    with pytest.raises(ValueError):
+        batch_module.run([str(tree / "a.txt"), str(other / "a.txt")], ["en"], str(tmp_path / "out"))
+    assert calls == []
+    with pytest.raises(SystemExit):
+        batch_module.main([str(tree / "a.txt"), str(other / "a.txt"), "-t", "en", "-o", str(tmp_path / "out")])
@@ -0,0 +1,46 @@
+# tests/test_cache_module.py
+
+import time
+
+from modules.cache_module import TranslationCache, make_key, normalize_text
+
+
+def test_normalize_text_and_key():
+    assert normalize_text("  Bonjour   le\tmonde \n ça va ") == "Bonjour le monde\nça va"
+    assert make_key("translate", "Bonjour  monde", "fra_Latn", "eng_Latn") == \
+        make_key("translate", " Bonjour monde ", "fra_Latn", "eng_Latn")
+    assert make_key("translate", "Bonjour", "fra_Latn", "eng_Latn") != make_key("translate", "Bonjour", "fra_Latn", "spa_Latn")
+
+
+def test_memory_then_disk(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = TranslationCache(path, max_memory_items=2)
+    cache.set_many({"a": "A", "b": ["B", 1], "c": {"x": "C"}})
+    assert len(cache.memory) == 2  # LRU mémoire borné
+    assert cache.get_many(["a", "b", "c", "d"]) == {"a": "A", "b": ["B", 1], "c": {"x": "C"}}
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 2 and stats["misses"] == 1
+
+    # Persistance : un nouveau cache relit le disque
+    assert TranslationCache(path).get("c") == {"x": "C"}
+
+
+def test_ttl(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.set("old", "value")
+    cache.memory.clear()
+    cache.db.execute("UPDATE cache SET created=?", (time.time() - 120,))
+    assert cache.get("old") is None
+
+
+def test_disk_eviction(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"), max_memory_items=10, max_disk_items=100)
+    cache.set_many({f"k{i}": i for i in range(1000)})  # déclenche le nettoyage (1000 écritures)
+    assert cache.stats()["disk_items"] == 100
+
+
+def test_clear(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    cache.set("a", "A")
+    cache.clear()
+    assert cache.get("a") is None and cache.stats()["disk_items"] == 0
@@ -0,0 +1,32 @@
+# tests/test_download_module.py
+
+import pytest
+
+pytest.importorskip("fpdf")
+pytest.importorskip("docx")
+
+from modules import download_module
+from modules.download_module import render_translation
+
+
+def test_pdf_multiline():
+    data = render_translation("Ligne 1\nLigne 2\n\nLigne 3", "Line 1\nLine 2\n\nLine 3", "fr", "en", "pdf")
+    assert data.startswith(b"%PDF")
+
+
+def test_pdf_multiline_multi_target():
+    data = render_translation("Ligne 1\nLigne 2", {"en": "Line 1\nLine 2", "es": "Línea 1\nLínea 2"}, "fr", "en", "pdf")
+    assert data.startswith(b"%PDF")
+
+
+def test_export_cache_bounded_in_bytes(monkeypatch):
+    monkeypatch.setattr(download_module, "EXPORT_CACHE_BYTES", 1000)
+    monkeypatch.setattr(download_module, "_exports", download_module.OrderedDict())
+    monkeypatch.setattr(download_module, "_exports_bytes", 0)
+    for i in range(5):
+        render_translation("x" * 300 + str(i), "y", "fr", "en", "txt")
+    assert download_module._exports_bytes <= 1000
+    assert download_module._exports_bytes == sum(len(data) for data in download_module._exports.values())
+    assert len(download_module._exports) < 5
+    render_translation("z" * 5000, "y", "fr", "en", "txt")  # plus gros que le budget : non gardé
+    assert all(len(data) <= 1000 for data in download_module._exports.values())
@@ -0,0 +1,77 @@
+# tests/test_history_module.py
+
+import json
+
+import pytest
+
+from modules import history_module
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_module, "HISTORY_DB", str(tmp_path / "history.db"))
+    monkeypatch.setattr(history_module, "LEGACY_JSON", str(tmp_path / "history.json"))
+    monkeypatch.setattr(history_module, "_db", None)
+    monkeypatch.setattr(history_module, "_fts", True)
+    yield history_module
+    if history_module._db is not None:
+        history_module._db.close()
+
+
+def _fill(history):
+    history.add_entry("Bonjour le monde", "Hello world", "fr", "en", "2024-01-05 10:00")
+    history.add_entry("Le chat dort", "The cat sleeps", "fr", "en", "2024-02-10 09:30")
+    history.add_entry("El perro come", "Le chien mange", "es", "fr", "2024-02-10 23:59")
+    history.add_entry("Guten Morgen", "Good morning", "de", "en", "2024-03-01 08:00")
+
+
+def test_pages_most_recent_first(history):
+    _fill(history)
+    assert [e["original"] for e in history.get_entries(page_size=3)] == \
+        ["Guten Morgen", "El perro come", "Le chat dort"]
+    assert [e["original"] for e in history.get_entries(page=1, page_size=3)] == ["Bonjour le monde"]
+    assert [e["original"] for e in history.iter_entries(chunk_size=2)] == \
+        ["Bonjour le monde", "Le chat dort", "El perro come", "Guten Morgen"]
+
+
+def test_language_and_date_filters(history):
+    _fill(history)
+    assert history.count_entries(source_lang="fr") == 2
+    assert history.count_entries(target_lang="en") == 3
+    assert history.count_entries(source_lang="fr", target_lang="fr") == 0
+    # date_to inclusive
+    assert history.count_entries(date_from="2024-02-10", date_to="2024-02-10") == 2
+    assert history.count_entries(date_from="2024-02-11") == 1
+    assert history.count_entries(date_to="2024-01-31") == 1
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_full_text_query(history, monkeypatch, fts):
+    _fill(history)
+    if not fts:
+        # Repli sur LIKE quand FTS5 est absent
+        monkeypatch.setattr(history_module, "_fts", False)
+    assert [e["translated"] for e in history.get_entries(query="chat")] == ["The cat sleeps"]
+    # Recherche dans la traduction, par préfixe, tous les termes requis
+    assert history.count_entries(query="morn") == 1
+    assert history.count_entries(query="le chien") == 1
+    assert history.count_entries(query="le chien", source_lang="fr") == 0
+    assert history.count_entries(query='"') == 0
+    assert history.count_entries(query="   ") == 4
+
+
+def test_migrates_legacy_json_once(history, tmp_path):
+    legacy = tmp_path / "history.json"
+    lines = [json.dumps({"original": "Salut", "translated": "Hi", "source_lang": "fr",
+                         "target_lang": "en", "timestamp": "2023-12-31 12:00"}), "", "{invalide"]
+    legacy.write_text("\n".join(lines), encoding="utf-8")
+
+    history.add_entry("Merci", "Thanks", "fr", "en")
+    assert not legacy.exists() and (tmp_path / "history.json.bak").exists()
+    assert [e["original"] for e in history.iter_entries()] == ["Salut", "Merci"]
+    assert history.count_entries(query="salut") == 1
+
+    # Un nouveau history.json n'est pas réimporté
+    legacy.write_text(lines[0], encoding="utf-8")
+    assert history.migrate_json() == 0
+    assert history.count_entries() == 2
@@ -0,0 +1,36 @@
+# tests/test_langid_module.py
+
+import pytest
+
+from modules.langid_module import fast_detect
+
+SAMPLES = {
+    "fr": "Le chat dort sur le canapé pendant que les enfants jouent dans le jardin avec leurs amis.",
+    "en": "The weather was nice and the children were playing in the garden with their friends.",
+    "es": "El niño está jugando en el parque con sus amigos porque hace muy buen tiempo hoy.",
+    "de": "Der Hund schläft auf dem Sofa, und die Kinder spielen mit ihren Freunden im Garten.",
+    "ar": "ذهب الأطفال إلى الحديقة للعب مع أصدقائهم في يوم مشمس جميل.",
+}
+
+
+@pytest.mark.parametrize("lang", sorted(SAMPLES))
+def test_detects_language(lang):
+    detected, confidence = fast_detect(SAMPLES[lang])
+    assert detected == lang
+    assert confidence >= 0.5
+
+
+def test_no_letters():
+    assert fast_detect("") == ("en", 0.0)
+    assert fast_detect("12 345 -- 678 !") == ("en", 0.0)
+
+
+def test_short_text_low_confidence():
+    # Peu d'indices : l'appelant doit se rabattre sur le modèle
+    _, confidence = fast_detect("Bonjour")
+    assert confidence < 0.5
+
+
+def test_max_chars():
+    text = SAMPLES["de"] + " " + SAMPLES["en"] * 50
+    assert fast_detect(text, max_chars=len(SAMPLES["de"]))[0] == "de"
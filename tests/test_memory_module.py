@@ -0,0 +1,79 @@
+# tests/test_memory_module.py
+
+from modules.memory_module import ENTITY, NUMBER, TranslationMemory, _Entry, mask, template
+
+
+def test_mask_numbers_entities_and_sentence_start():
+    masked, values = mask("Le contrat 12 est signé à Lyon. Paris attend la NASA sur https://x.org.")
+    assert values == [(NUMBER, "12"), (ENTITY, "Lyon"), (ENTITY, "NASA"), (ENTITY, "https://x.org.")]
+    # Mot capitalisé en début de phrase : pas un nom propre
+    assert masked.startswith("Le contrat " + NUMBER) and "Paris" in masked
+
+
+def test_template_longest_values_first():
+    target, slots = template("Year 2010, page 10", [(NUMBER, "10"), (NUMBER, "2010")])
+    assert target == "Year \ue0021\ue003, page \ue0020\ue003"
+    assert slots == {0, 1}
+
+
+def test_entry_fill():
+    entry = _Entry("Le contrat 12 est signé à Lyon.", "Contract 12 is signed in Lyon.")
+    assert entry.fill(mask("Le contrat 14 est signé à Paris.")[1]) == "Contract 14 is signed in Paris."
+    # Nombre absent de la traduction mémorisée : non remplaçable, la valeur doit être identique
+    entry = _Entry("Page 3 du contrat 12.", "Contract 12.")
+    assert entry.fill(mask("Page 4 du contrat 13.")[1]) is None
+    assert entry.fill(mask("Page 3 du contrat 13.")[1]) == "Contract 13."
+    # Marqueurs de types différents
+    assert entry.fill([(ENTITY, "X"), (NUMBER, "1")]) is None
+
+
+def _memory(tmp_path, **options):
+    memory = TranslationMemory(str(tmp_path / "tm.db"), **options)
+    memory.add_many([
+        ("Le contrat 12 est signé à Lyon.", "Contract 12 is signed in Lyon."),
+        ("I really like this product very much.", "J'aime vraiment beaucoup ce produit."),
+    ], "src", "tgt")
+    return memory
+
+
+def test_served_only_when_words_match(tmp_path):
+    memory = _memory(tmp_path)
+    found = memory.lookup_many([
+        "Le contrat 12 est signé à Lyon.",            # exact
+        "Le contrat 14 est signé à Paris.",           # nombre et nom remplacés
+        "Le contrat 12, est signé à Lyon.",           # ponctuation interne
+        "Le contrat 12 est signé à Lyon ?",           # ponctuation finale différente
+        "I really dislike this product very much.",   # mot différent
+    ], "src", "tgt")
+    assert found[0] == ("Contract 12 is signed in Lyon.", 1.0)
+    assert found[1] == ("Contract 14 is signed in Paris.", 1.0)
+    assert found[2][0] == "Contract 12 is signed in Lyon."
+    assert 3 not in found and 4 not in found
+    stats = memory.stats()
+    assert (stats["exact_matches"], stats["substituted_matches"], stats["variant_matches"]) == (1, 1, 1)
+
+
+def test_suggestions_for_unserved_segments(tmp_path):
+    memory = _memory(tmp_path)
+    suggestions = memory.suggest_many(["I really dislike this product very much.", "Le contrat 12 est signé à Lyon."],
+                                      "src", "tgt")
+    assert list(suggestions) == [0]  # le segment servi directement n'est pas une suggestion
+    assert suggestions[0][0] == "J'aime vraiment beaucoup ce produit." and suggestions[0][1] >= memory.threshold
+
+
+def test_persistence_and_language_pairs(tmp_path):
+    _memory(tmp_path)
+    memory = TranslationMemory(str(tmp_path / "tm.db"))
+    assert memory.lookup("Le contrat 12 est signé à Lyon.", "src", "tgt") is not None
+    assert memory.lookup("Le contrat 12 est signé à Lyon.", "src", "other") is None
+
+
+def test_max_entries(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.db"), max_entries=100)
+    for batch in range(30):
+        memory.add_many([(f"Phrase {word}{batch} numéro", "t") for word in ("a", "b", "c", "d", "e")], "src", "tgt")
+        memory.add_many([(f"Mot{batch}x{i} seul", "t") for i in range(10)], "src", "tgt")
+    assert len(memory.indexes["src", "tgt"].entries) <= 110
+    assert memory.stats()["entries"] <= 110
+    assert memory.lookup("Mot29x9 seul", "src", "tgt") == ("t", 1.0)
+    assert memory.lookup("Mot0x0 seul", "src", "tgt") is None
@@ -0,0 +1,108 @@
+# tests/test_translator_module.py
+# Ordonnanceur de micro-lots, avec un generate_batch factice (pas de modèle chargé).
+
+import threading
+import time
+
+import pytest
+
+from modules import translator_module
+from modules.translator_module import TranslationScheduler
+
+
+class Calls(list):
+    """Lots reçus par le faux modèle ; `release` bloque le décodage tant qu'il n'est pas levé."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.release.set()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Remplace NLLB : chaque lot est enregistré (cible, max_length, taille) et traduit en "cible:ids"."""
+    calls = Calls()
+    release = calls.release
+
+    def fake_generate(tokenizer, model, batch, tgt_lang, max_length):
+        calls.append((tgt_lang, max_length, len(batch)))
+        release.wait(5)
+        return [f"{tgt_lang}:{ids}" for ids in batch]
+
+    monkeypatch.setattr(translator_module, "get_model", lambda name: (None, None))
+    monkeypatch.setattr(translator_module, "generate_batch", fake_generate)
+    return calls
+
+
+def test_batches_grouped_by_target_and_max_length(calls):
+    scheduler = TranslationScheduler(max_batch_size=8, max_wait=0.05)
+    try:
+        futures = [scheduler.submit(i, "eng_Latn", 64 if i % 2 else 128) for i in range(6)]
+        futures.append(scheduler.submit(9, "fra_Latn"))
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        scheduler.shutdown()
+    assert results == [f"eng_Latn:{i}" for i in range(6)] + ["fra_Latn:9"]
+    assert sorted(calls) == [("eng_Latn", 64, 3), ("eng_Latn", 128, 3), ("fra_Latn", 512, 1)]
+
+
+def test_max_batch_size(calls):
+    scheduler = TranslationScheduler(max_batch_size=4, max_wait=0.05)
+    try:
+        futures = [scheduler.submit(i, "eng_Latn") for i in range(10)]
+        assert [f.result(timeout=5) for f in futures] == [f"eng_Latn:{i}" for i in range(10)]
+    finally:
+        scheduler.shutdown()
+    assert all(size <= 4 for _, _, size in calls)
+    assert sum(size for _, _, size in calls) == 10
+
+
+def test_shutdown_fails_pending_requests(calls):
+    scheduler = TranslationScheduler(max_batch_size=4, max_wait=0.01)
+    calls.release.clear()
+    running = scheduler.submit(1, "eng_Latn")
+    while not calls:
+        time.sleep(0.01)  # premier lot en cours de décodage
+    queued = [scheduler.submit(2, "spa_Latn"), scheduler.submit(3, "deu_Latn")]
+    threading.Timer(0.1, calls.release.set).start()
+    scheduler.shutdown()
+
+    assert running.result(timeout=1) == "eng_Latn:1"
+    for future in queued:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(4, "eng_Latn")
+
+
+def test_generation_error_reaches_every_caller(monkeypatch):
+    def failing(*args):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(translator_module, "get_model", lambda name: (None, None))
+    monkeypatch.setattr(translator_module, "generate_batch", failing)
+    scheduler = TranslationScheduler(max_wait=0.05)
+    try:
+        futures = [scheduler.submit(i, "eng_Latn") for i in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+
+def test_queue_full_rejects(calls):
+    calls.release.clear()
+    scheduler = TranslationScheduler(max_batch_size=1, max_wait=0.0, max_queue=1, submit_timeout=0.05)
+    try:
+        scheduler.submit(1, "eng_Latn")
+        while not calls:
+            time.sleep(0.01)
+        scheduler.submit(2, "eng_Latn")  # occupe l'unique place de la file
+        with pytest.raises(RuntimeError):
+            scheduler.submit(3, "eng_Latn")
+        assert scheduler.metrics()["rejected"] == 1
+    finally:
+        calls.release.set()
+        scheduler.shutdown()